@@ -62,6 +62,14 @@ Examples:
 
         await check_job(jobid)
 
+    Waiting until the compliance job is finished::
+
+        import os
+        os.environ["BEARER_TOKEN"] = "xxxxxxxxxxx"
+        from sparta.twitterapi.compliance.compliance import wait_for_completion
+
+        compliancejob = await wait_for_completion(jobid)
+
     Downloading the results::
 
         import os
@@ -78,30 +86,54 @@ Examples:
         await download_results(downloadurl, 'results.txt')
 """
 
-import json
+import asyncio
 import logging
 import os
-from typing import Any, Dict
+from typing import Any, AsyncGenerator, Dict
 
 import aiohttp
-from pydantic import AnyUrl
+from pydantic import AnyUrl, TypeAdapter
+from pydantic_core import to_json
 
+from sparta.twitterapi.http import JSON_HEADERS, get_session
 from sparta.twitterapi.models.twitter_v2_spec import (
+    ComplianceJob,
     ComplianceJobStatus,
     ComplianceJobType,
     CreateComplianceJobResponse,
     Get2ComplianceJobsIdResponse,
     Get2ComplianceJobsResponse,
 )
+from sparta.twitterapi.rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
-
 COMPLIANCE_URL = "https://api.twitter.com/2/compliance/jobs"
+UPLOAD_CHUNK_SIZE = 1 << 20  # Bytes read from disk per chunk while uploading IDs
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # Bytes written to disk per chunk while downloading results
+
+# Validators are built once at import and reused for every response.
+_CREATE_JOB_ADAPTER = TypeAdapter(CreateComplianceJobResponse)
+_JOBS_ADAPTER = TypeAdapter(Get2ComplianceJobsResponse)
+_JOB_ADAPTER = TypeAdapter(Get2ComplianceJobsIdResponse)
+
+# Shared by all list_job calls, since the job status is polled repeatedly against the same rate limit window.
+_job_rate_limiter = RateLimiter()
+
+
+async def _read_file_chunks(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncGenerator[bytes, None]:
+    """Reads a file in fixed size chunks without blocking the event loop.
+
+    Args:
+        path (str): Path of the file to read.
+        chunk_size (int, optional): Number of bytes per chunk. Defaults to UPLOAD_CHUNK_SIZE.
+
+    Yields:
+        bytes: The next chunk of the file.
+    """
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
 
 
 async def create_compliance_job(type: ComplianceJobType, name: str, resumable: bool = False) -> CreateComplianceJobResponse:
@@ -118,15 +150,15 @@ async def create_compliance_job(type: ComplianceJobType, name: str, resumable: b
     Returns:
         CreateComplianceJobResponse: Returns an Twitter CreateComplianceJobResponse object.
     """
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
-        # Set the Job request parameters.
-        dataDict: Dict[str, Any] = {"type": type.name, "name": name, "resumable": resumable}
+    session = get_session()
+    # Set the Job request parameters.
+    dataDict: Dict[str, Any] = {"type": type.name, "name": name, "resumable": resumable}
 
-        async with session.post(COMPLIANCE_URL, data=json.dumps(dataDict)) as response:
-            if not response.ok:
-                raise Exception(f"Error creating Compliance Job: (HTTP {response.status}): {await response.text()}")
+    async with session.post(COMPLIANCE_URL, data=to_json(dataDict), headers=JSON_HEADERS) as response:
+        if not response.ok:
+            raise Exception(f"Error creating Compliance Job: (HTTP {response.status}): {await response.text()}")
 
-            return CreateComplianceJobResponse.model_validate_json(await response.text())
+        return _CREATE_JOB_ADAPTER.validate_json(await response.read())
 
 
 async def list_jobs(type: ComplianceJobType, status: ComplianceJobStatus = None) -> Get2ComplianceJobsResponse:
@@ -142,18 +174,17 @@ async def list_jobs(type: ComplianceJobType, status: ComplianceJobStatus = None)
     Returns:
         Get2ComplianceJobsResponse: Returns an Twitter Get2ComplianceJobsResponse object.
     """
+    session = get_session()
+    params: Dict[str, str] = {
+        "type": type.name,
+    }
+    if status:
+        params["status"] = status.name
 
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
-        params: Dict[str, str] = {
-            "type": type.name,
-        }
-        if status:
-            params["status"] = status.name
-
-        async with session.get(f"{COMPLIANCE_URL}", params=params) as response:
-            if not response.ok:
-                raise Exception(f"Cannot get Compliance Jobs (HTTP {response.status}): {await response.text()}")
-            return Get2ComplianceJobsResponse.model_validate_json(await response.text())
+    async with session.get(f"{COMPLIANCE_URL}", params=params) as response:
+        if not response.ok:
+            raise Exception(f"Cannot get Compliance Jobs (HTTP {response.status}): {await response.text()}")
+        return _JOBS_ADAPTER.validate_json(await response.read())
 
 
 async def list_job(id: str) -> Get2ComplianceJobsIdResponse:
@@ -167,12 +198,57 @@ async def list_job(id: str) -> Get2ComplianceJobsIdResponse:
 
     Returns:
         Get2ComplianceJobsIdResponse: Returns an Twitter Get2ComplianceJobsIdResponse object.
+
+    Note:
+        This endpoint is typically polled. The rate limit state is shared between calls, so a call waits for the limit reset instead of provoking an HTTP 429.
     """
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
+    session = get_session()
+    while True:
+        if _job_rate_limiter.should_wait():
+            await _job_rate_limiter.wait_for_limit_reset()
+
         async with session.get(f"{COMPLIANCE_URL}/{id}") as response:
+            _job_rate_limiter.update_from_response(response)
+
+            if response.status == 429:
+                await _job_rate_limiter.wait_for_limit_reset()
+                continue
+
             if not response.ok:
                 raise Exception(f"Cannot get Compliance Job (HTTP {response.status}): {await response.text()}")
-            return Get2ComplianceJobsIdResponse.model_validate_json(await response.text())
+            return _JOB_ADAPTER.validate_json(await response.read())
+
+
+async def wait_for_completion(id: str, initial_delay: float = 2.0, max_delay: float = 60.0, factor: float = 1.7) -> ComplianceJob:
+    """Polls a Compliance Job until it is no longer created or in progress.
+
+    The delay between polls grows exponentially, so short jobs are detected quickly while long jobs do not spend the rate limit on frequent polls.
+
+    Args:
+        id (str): The ID of the Compliance Job to wait for.
+        initial_delay (float, optional): Seconds to wait after the first poll. Defaults to 2.0.
+        max_delay (float, optional): Upper bound for the delay between polls in seconds. Defaults to 60.0.
+        factor (float, optional): Factor the delay grows by after each poll. Defaults to 1.7.
+
+    Raises:
+        Exception: Compliance Job can not be fetched due to an http error or the response contains no job.
+
+    Returns:
+        ComplianceJob: The Compliance Job in its final status (complete, failed or expired).
+    """
+    delay = initial_delay
+    while True:
+        compliancejobresponse = await list_job(id)
+        if not compliancejobresponse.data:
+            raise Exception(f"Cannot get Compliance Job {id}: {compliancejobresponse.errors}")
+
+        compliancejob = compliancejobresponse.data
+        if compliancejob.status not in (ComplianceJobStatus.created, ComplianceJobStatus.in_progress):
+            return compliancejob
+
+        logger.debug(f"Compliance Job {id} is {compliancejob.status.value}, polling again in {delay:.1f} seconds")
+        await asyncio.sleep(delay)
+        delay = min(delay * factor, max_delay)
 
 
 async def upload_ids(upload_url: AnyUrl, ids_file_path: str) -> str:
@@ -189,13 +265,13 @@ async def upload_ids(upload_url: AnyUrl, ids_file_path: str) -> str:
         str: Response text
     """
     # Not passing in auth details, since the Upload URL is already signed...
-    headers = {"content-type": "text/plain"}
-
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
-        async with session.put(f"{upload_url}", data=open(ids_file_path, "rb")) as response:
-            if not response.ok:
-                raise Exception(f"Cannot upload IDs (HTTP {response.status}): {await response.text()}")
-            return await response.text()
+    session = get_session(authenticated=False)
+    # An explicit Content-Length keeps the PUT from falling back to chunked transfer-encoding.
+    headers = {"content-type": "text/plain", "content-length": str(os.path.getsize(ids_file_path))}
+    async with session.put(f"{upload_url}", data=_read_file_chunks(ids_file_path), headers=headers) as response:
+        if not response.ok:
+            raise Exception(f"Cannot upload IDs (HTTP {response.status}): {await response.text()}")
+        return await response.text()
 
 
 async def download_results(download_url: AnyUrl, results_file_path: str) -> int:
@@ -212,14 +288,19 @@ async def download_results(download_url: AnyUrl, results_file_path: str) -> int:
     Returns:
         int: Respone status.
     """
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
-        async with session.get(f"{download_url}") as response:
-            if not response.ok:
-                raise Exception(f"Cannot download results (HTTP {response.status}): {await response.text()}")
-
-            try:
-                with open(results_file_path, "w") as f:
-                    f.write(await response.text())
-            except Exception:
-                raise Exception(f"Error writing results to {results_file_path}")
-            return response.status
+    session = get_session()
+    # Result files can be large, so they are streamed to disk chunk by chunk instead of being buffered in memory. sock_read detects stalled downloads.
+    # They are newline delimited JSON and compress well, the session asks for compressed responses with http.ACCEPT_ENCODING.
+    async with session.get(f"{download_url}", timeout=aiohttp.ClientTimeout(total=None, sock_read=60)) as response:
+        if not response.ok:
+            raise Exception(f"Cannot download results (HTTP {response.status}): {await response.text()}")
+        logger.debug(f"Downloading results with content-encoding {response.headers.get('Content-Encoding', 'identity')}")
+
+        try:
+            with open(results_file_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    # Disk writes block, so they run in a worker thread to keep the event loop responsive.
+                    await asyncio.to_thread(f.write, chunk)
+        except OSError:
+            raise Exception(f"Error writing results to {results_file_path}")
+        return response.status
@@ -28,23 +28,140 @@ Examples:
 
         async for complianceEvent in get_user_compliance_stream(partition=1):
             print(complianceEvent)
+
+    Start the compliance stream for tweets on all partitions at once::
+
+        import os
+        os.environ["BEARER_TOKEN"] = "xxxxxxxxxxx"
+        from sparta.twitterapi.compliance.compliance_stream import get_all_tweet_compliance_events
+
+        async for complianceEvent in get_all_tweet_compliance_events():
+            print(complianceEvent)
+
+    Start the compliance stream for tweets without validating the events::
+
+        import os
+        os.environ["BEARER_TOKEN"] = "xxxxxxxxxxx"
+        from sparta.twitterapi.compliance.compliance_stream import get_tweet_compliance_stream_raw
+
+        async for complianceEvent in get_tweet_compliance_stream_raw(partition=1):
+            print(complianceEvent["data"])
 """
 
+import asyncio
+import functools
 import logging
-import os
+import random
 from datetime import datetime
-from typing import Any, AsyncGenerator, Dict, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, TypeVar
 
 import aiohttp
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import from_json
 
+from sparta.twitterapi.http import get_session, iter_line_batches
 from sparta.twitterapi.models.twitter_v2_spec import TweetComplianceStreamResponse1, UserComplianceStreamResponse1
+from sparta.twitterapi.utils import format_datetime, merge
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ.get("BEARER_TOKEN")
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+PARTITIONS = (1, 2, 3, 4)  # Compliance events are split across 4 partitions
+RECONNECT_INITIAL_DELAY = 1.0  # Seconds before the first reconnect attempt, doubled for every failed attempt
+RECONNECT_MAX_DELAY = 320.0  # Upper bound of the reconnect delay
+# The streams send keep-alive newlines, so a connection that stays silent this long is considered dead (e.g. dropped by a proxy).
+STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=120)
+
+# Validators are built once at import and reused for every streamed event.
+_TWEET_COMPLIANCE_ADAPTER = TypeAdapter(TweetComplianceStreamResponse1)
+_USER_COMPLIANCE_ADAPTER = TypeAdapter(UserComplianceStreamResponse1)
+
+T = TypeVar("T")
+
+
+def _validate_lines(adapter: TypeAdapter[T], lines: List[bytes]) -> List[T]:
+    """Validates a batch of streamed lines, skipping keep-alive lines and events that do not match the schema.
+
+    Args:
+        adapter (TypeAdapter[T]): The validator for the events of the stream.
+        lines (List[bytes]): The raw lines of the stream.
+
+    Returns:
+        List[T]: The validated events in stream order.
+    """
+    events: List[T] = []
+    for line in lines:
+        if line:
+            try:
+                events.append(adapter.validate_json(line))
+            except ValidationError as e:
+                logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
+                logger.warning(line.decode(errors="replace"))
+    return events
+
+
+def _parse_lines(lines: List[bytes]) -> List[Dict[str, Any]]:
+    """Parses a batch of streamed lines without validating them, skipping keep-alive lines and malformed JSON.
+
+    Args:
+        lines (List[bytes]): The raw lines of the stream.
+
+    Returns:
+        List[Dict[str, Any]]: The parsed events in stream order.
+    """
+    events: List[Dict[str, Any]] = []
+    for line in lines:
+        if line:
+            try:
+                events.append(from_json(line))
+            except ValueError as e:
+                logger.warning(f"Malformed compliance event {e}")
+                logger.warning(line.decode(errors="replace"))
+    return events
+
+
+async def _stream_events(url: str, params: Dict[str, Any], parse: Callable[[List[bytes]], List[T]]) -> AsyncGenerator[T, None]:
+    """Opens a compliance stream and yields its parsed events in stream order.
+
+    The stream is reopened with a jittered exponential backoff when the connection drops, stalls or the API is temporarily unavailable.
+
+    Args:
+        url (str): The compliance stream endpoint.
+        params (Dict[str, Any]): The query parameters of the stream.
+        parse (Callable[[List[bytes]], List[T]]): Turns a batch of raw lines into events.
+
+    Raises:
+        Exception: Cannot open the stream due to an http error.
+
+    Yields:
+        T: The next event of the stream.
+    """
+    session = get_session()
+    reconnects = 0
+    delay = 0.0
+    while True:
+        if delay:
+            # Jitter spreads the reconnects of many clients after an outage instead of hitting the API at the same moment.
+            wait_time = delay * random.uniform(0.5, 1.5)
+            logger.warning(f"Reconnecting compliance stream in {wait_time:.1f} seconds (reconnect {reconnects})")
+            await asyncio.sleep(wait_time)
+        logger.info("Start stream")
+        try:
+            async with session.get(url, params=params, timeout=STREAM_TIMEOUT) as response:
+                if response.status == 429 or response.status >= 500:
+                    logger.warning(f"Compliance stream unavailable (HTTP {response.status}): {await response.text()}")
+                elif not response.ok:
+                    raise Exception(f"Cannot open compliance stream (HTTP {response.status}): {await response.text()}")
+                else:
+                    delay = 0.0
+                    async for lines in iter_line_batches(response.content):
+                        # Validated inline: pydantic holds the GIL while validating, so a worker thread would not run it in parallel with the loop
+                        # and only adds a hand-off per batch. Batching per network chunk keeps the per-event overhead low instead.
+                        for event in parse(lines):
+                            yield event
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Compliance stream disconnected: {e!r}")
+        reconnects += 1
+        delay = min(max(delay * 2, RECONNECT_INITIAL_DELAY), RECONNECT_MAX_DELAY)
 
 
 async def get_tweet_compliance_stream(
@@ -69,31 +186,19 @@ async def get_tweet_compliance_stream(
     Yields:
         Iterator[AsyncGenerator[TweetComplianceStreamResponse1, None]]: A Twitter TweetComplianceStreamResponse1 object.
     """
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
-        params: Dict[str, Any] = {"partition": str(partition)}
-
-        if backfill_minutes:
-            params["backfill_minutes"] = backfill_minutes
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        while True:
-            logger.info("Start stream")
-            async with session.get("https://api.twitter.com/2/tweets/compliance/stream", params=params) as response:
-                if not response.ok:
-                    raise Exception(f"Cannot open compliance stream (HTTP {response.status}): {await response.text()}")
-                while True:
-                    line = await response.content.readline()
-                    if line == b"":
-                        break
-                    if line != b"\r\n":
-                        try:
-                            yield TweetComplianceStreamResponse1.model_validate_json(line)
-                        except Exception as e:
-                            logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
-                            logger.warning(line)
+    params: Dict[str, Any] = {"partition": str(partition)}
+
+    if backfill_minutes:
+        params["backfill_minutes"] = backfill_minutes
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+
+    async for event in _stream_events(
+        "https://api.twitter.com/2/tweets/compliance/stream", params, functools.partial(_validate_lines, _TWEET_COMPLIANCE_ADAPTER)
+    ):
+        yield event
 
 
 async def get_user_compliance_stream(
@@ -118,28 +223,134 @@ async def get_user_compliance_stream(
     Yields:
         Iterator[AsyncGenerator[UserComplianceStreamResponse1, None]]: A Twitter UserComplianceStreamResponse1 object.
     """
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
-        params: Dict[str, Any] = {"partition": str(partition)}
-
-        if backfill_minutes:
-            params["backfill_minutes"] = backfill_minutes
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        while True:
-            logger.info("Start stream")
-            async with session.get("https://api.twitter.com/2/users/compliance/stream", params=params) as response:
-                if not response.ok:
-                    raise Exception(f"Cannot open compliance stream (HTTP {response.status}): {await response.text()}")
-                while True:
-                    line = await response.content.readline()
-                    if line == b"":
-                        break
-                    if line != b"\r\n":
-                        try:
-                            yield UserComplianceStreamResponse1.model_validate_json(line)
-                        except Exception as e:
-                            logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
-                            logger.warning(line)
+    params: Dict[str, Any] = {"partition": str(partition)}
+
+    if backfill_minutes:
+        params["backfill_minutes"] = backfill_minutes
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+
+    async for event in _stream_events(
+        "https://api.twitter.com/2/users/compliance/stream", params, functools.partial(_validate_lines, _USER_COMPLIANCE_ADAPTER)
+    ):
+        yield event
+
+
+async def get_tweet_compliance_stream_raw(
+    partition: int = 1, backfill_minutes: Optional[int] = None, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Get an asynchronous tweet compliance-stream of unvalidated events as generator.
+
+    Skips the pydantic validation of get_tweet_compliance_stream for consumers that only forward or store the events. Checking the events against the
+    schema is the responsibility of the caller.
+
+    Args:
+        partition (int, optional): Must be set to 1, 2, 3 or 4. Tweet compliance events are split across 4 partitions, so 4 separate streams are needed to
+            receive all events. Defaults to 1.
+        backfill_minutes (Optional[int], optional): The number of minutes of backfill requested. Defaults to None.
+        start_time (Optional[datetime], optional): The earliest UTC timestamp from which the Tweet Compliance events will be provided. Defaults to None.
+        end_time (Optional[datetime], optional): The latest UTC timestamp to which the Tweet Compliance events will be provided. Defaults to None.
+
+    Raises:
+        Exception: Cannot open the stream due to an http error.
+
+    Yields:
+        Dict[str, Any]: A tweet compliance event as parsed from its JSON.
+    """
+    params: Dict[str, Any] = {"partition": str(partition)}
+
+    if backfill_minutes:
+        params["backfill_minutes"] = backfill_minutes
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+
+    async for event in _stream_events("https://api.twitter.com/2/tweets/compliance/stream", params, _parse_lines):
+        yield event
+
+
+async def get_user_compliance_stream_raw(
+    partition: int = 1, backfill_minutes: Optional[int] = None, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Get an asynchronous user compliance-stream of unvalidated events as generator.
+
+    Skips the pydantic validation of get_user_compliance_stream for consumers that only forward or store the events. Checking the events against the
+    schema is the responsibility of the caller.
+
+    Args:
+        partition (int, optional): Must be set to 1, 2, 3 or 4. User compliance events are split across 4 partitions, so 4 separate streams are needed to
+            receive all events. Defaults to 1.
+        backfill_minutes (Optional[int], optional): The number of minutes of backfill requested. Defaults to None.
+        start_time (Optional[datetime], optional): The earliest UTC timestamp from which the User Compliance events will be provided. Defaults to None.
+        end_time (Optional[datetime], optional): The latest UTC timestamp to which the User Compliance events will be provided. Defaults to None.
+
+    Raises:
+        Exception: Cannot open the stream due to an http error.
+
+    Yields:
+        Dict[str, Any]: A user compliance event as parsed from its JSON.
+    """
+    params: Dict[str, Any] = {"partition": str(partition)}
+
+    if backfill_minutes:
+        params["backfill_minutes"] = backfill_minutes
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+
+    async for event in _stream_events("https://api.twitter.com/2/users/compliance/stream", params, _parse_lines):
+        yield event
+
+
+async def get_all_tweet_compliance_events(
+    backfill_minutes: Optional[int] = None, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None, queue_size: int = 1024
+) -> AsyncGenerator[TweetComplianceStreamResponse1, None]:
+    """Get all tweet compliance events by consuming the 4 partitions of the tweet compliance-stream concurrently.
+
+    Args:
+        backfill_minutes (Optional[int], optional): The number of minutes of backfill requested. Defaults to None.
+        start_time (Optional[datetime], optional): The earliest UTC timestamp from which the Tweet Compliance events will be provided. Defaults to None.
+        end_time (Optional[datetime], optional): The latest UTC timestamp to which the Tweet Compliance events will be provided. Defaults to None.
+        queue_size (int, optional): Maximum number of events buffered before the partition streams pause. Defaults to 1024.
+
+    Raises:
+        Exception: Cannot open one of the streams due to an http error.
+
+    Returns:
+        AsyncGenerator[TweetComplianceStreamResponse1, None]: AsyncGenerator that yields Twitter TweetComplianceStreamResponse1 objects.
+
+    Yields:
+        Iterator[AsyncGenerator[TweetComplianceStreamResponse1, None]]: A Twitter TweetComplianceStreamResponse1 object.
+    """
+    streams = [get_tweet_compliance_stream(partition, backfill_minutes, start_time, end_time) for partition in PARTITIONS]
+    async for event in merge(*streams, queue_size=queue_size):
+        yield event
+
+
+async def get_all_user_compliance_events(
+    backfill_minutes: Optional[int] = None, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None, queue_size: int = 1024
+) -> AsyncGenerator[UserComplianceStreamResponse1, None]:
+    """Get all user compliance events by consuming the 4 partitions of the user compliance-stream concurrently.
+
+    Args:
+        backfill_minutes (Optional[int], optional): The number of minutes of backfill requested. Defaults to None.
+        start_time (Optional[datetime], optional): The earliest UTC timestamp from which the User Compliance events will be provided. Defaults to None.
+        end_time (Optional[datetime], optional): The latest UTC timestamp to which the User Compliance events will be provided. Defaults to None.
+        queue_size (int, optional): Maximum number of events buffered before the partition streams pause. Defaults to 1024.
+
+    Raises:
+        Exception: Cannot open one of the streams due to an http error.
+
+    Returns:
+        AsyncGenerator[UserComplianceStreamResponse1, None]: AsyncGenerator that yields Twitter UserComplianceStreamResponse1 objects.
+
+    Yields:
+        Iterator[AsyncGenerator[UserComplianceStreamResponse1, None]]: A Twitter UserComplianceStreamResponse1 object.
+    """
+    streams = [get_user_compliance_stream(partition, backfill_minutes, start_time, end_time) for partition in PARTITIONS]
+    async for event in merge(*streams, queue_size=queue_size):
+        yield event
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""http.py: Shared aiohttp sessions for the Twitter API endpoints.
+
+Opening a new ``aiohttp.ClientSession`` for every call pays a fresh TCP and TLS handshake each time and never reuses the keep-alive pool. The sessions in
+this module are created lazily on first use and shared by the endpoint functions, so repeated calls (e.g. polling a compliance job) reuse open connections.
+
+Examples:
+    Close the shared sessions on shutdown::
+
+        from sparta.twitterapi.http import close_session
+
+        await close_session()
+"""
+
+import asyncio
+import functools
+import importlib.util
+import logging
+import os
+import time
+from types import MappingProxyType
+from typing import AsyncGenerator, Callable, Dict, List, Mapping, Optional, Tuple, TypeVar
+from urllib.parse import quote, urlencode
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+READ_BUFSIZE = 1 << 22  # Read buffer of a response, large enough for big search pages and bursts on the streaming endpoints
+MAX_LINE_SIZE = 1 << 24  # Upper bound for a single line of a streaming endpoint
+MAX_FAILURES = 7  # Consecutive failed attempts of a request (429s, server or connection errors) before get_with_retry gives up
+FATAL_STATUSES = frozenset({400, 401, 402, 403, 404})  # Statuses of a request that cannot succeed when retried, e.g. a bad token or a suspended user
+# Brotli pages are considerably smaller than gzip ones. aiohttp decodes them only if a brotli package is installed, so br is not offered otherwise.
+ACCEPT_ENCODING = "br, gzip" if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi") else "gzip"
+
+# Sent only with requests that have a JSON body, the GET requests of the endpoints have none
+JSON_HEADERS: Mapping[str, str] = MappingProxyType({"content-type": "application/json"})
+
+# Sessions are bound to the event loop they were created in, so they are cached per (loop, authenticated).
+_sessions: Dict[Tuple[asyncio.AbstractEventLoop, bool], aiohttp.ClientSession] = {}
+
+
+@functools.lru_cache(maxsize=1)
+def _build_auth_headers(bearer_token: str) -> CIMultiDictProxy[str]:
+    """Builds the request headers shared by all authenticated endpoints.
+
+    The headers are built once per token as a read-only case-insensitive multidict, the type aiohttp uses for headers internally. They ask for compressed
+    responses with ACCEPT_ENCODING.
+
+    Args:
+        bearer_token (str): The bearer token of the Twitter app.
+
+    Returns:
+        CIMultiDictProxy[str]: Headers authenticating requests against the Twitter API.
+    """
+    return CIMultiDictProxy(CIMultiDict({"Authorization": f"Bearer {bearer_token}", "Accept-Encoding": ACCEPT_ENCODING}))
+
+
+def _auth_headers() -> CIMultiDictProxy[str]:
+    """Returns the request headers for the current bearer token.
+
+    The token is read when a session is created instead of at import, so modules can be imported before the environment is set up and a rotated token is
+    picked up by the next session.
+
+    Raises:
+        KeyError: The BEARER_TOKEN environment variable is not set.
+
+    Returns:
+        CIMultiDictProxy[str]: Headers authenticating requests against the Twitter API.
+    """
+    # To set your enviornment variables in your terminal run the following line:
+    # export 'BEARER_TOKEN'='<your_bearer_token>'
+    return _build_auth_headers(os.environ["BEARER_TOKEN"])
+
+
+def get_session(authenticated: bool = True) -> aiohttp.ClientSession:
+    """Returns the shared session for the running event loop, creating it on first use.
+
+    Args:
+        authenticated (bool, optional): If true, the session sends the bearer token with every request. Pre-signed URLs (e.g. compliance job uploads) must
+            not receive the token and use the unauthenticated session. Defaults to True.
+
+    Returns:
+        aiohttp.ClientSession: A session backed by a keep-alive connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    key = (loop, authenticated)
+    session = _sessions.get(key)
+    if session is None or session.closed:
+        # Forget sessions of event loops that are already gone (e.g. earlier asyncio.run calls)
+        for stale in [stale for stale in _sessions if stale[0].is_closed()]:
+            del _sessions[stale]
+        connector = aiohttp.TCPConnector(limit=200, limit_per_host=50, use_dns_cache=True, ttl_dns_cache=300, keepalive_timeout=75)
+        session = aiohttp.ClientSession(
+            headers=_auth_headers() if authenticated else None,
+            connector=connector,
+            connector_owner=True,
+            read_bufsize=READ_BUFSIZE,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+        )
+        _sessions[key] = session
+        logger.debug(f"Created {'authenticated' if authenticated else 'unauthenticated'} session")
+    return session
+
+
+async def close_session() -> None:
+    """Closes the shared sessions of the running event loop.
+
+    Call this once on application shutdown to release pooled connections. To rotate the bearer token, update the BEARER_TOKEN environment variable and close
+    the sessions; the next request opens a session with the new token.
+    """
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _sessions if key[0] is loop]:
+        await _sessions.pop(key).close()
+
+
+async def get_with_retry(
+    session: aiohttp.ClientSession,
+    url: URL,
+    rate_limiter: RateLimiter,
+    backpressure: BackpressureController,
+    error_message: str,
+    window: Optional[SlidingWindowLimiter] = None,
+) -> bytes:
+    """Requests a page of an endpoint until it succeeds.
+
+    Each attempt first reserves one of the remaining requests of the rate limit, waiting for the reset if none are left. It then waits for the request
+    window of the endpoint, if given, and is admitted by the backpressure controller of the endpoint, which is told whether it succeeded. After a 429 the
+    function waits for the Retry-After or rate limit reset of the response, after other errors and failed connections with exponential backoff and
+    jitter. It waits outside the admitted slot, so concurrent requests to the endpoint are not blocked meanwhile. Statuses in FATAL_STATUSES, e.g. an
+    invalid token, cannot succeed when retried and raise at once.
+
+    Args:
+        session (aiohttp.ClientSession): The session used for the request.
+        url (URL): The URL of the page.
+        rate_limiter (RateLimiter): The rate limiter of the endpoint, updated from each response.
+        backpressure (BackpressureController): The controller limiting the concurrent requests to the endpoint.
+        error_message (str): The message logged when a request fails, e.g. "Cannot search full tweets".
+        window (Optional[SlidingWindowLimiter], optional): The request window of the endpoint, which keeps the requests within its known rate limit.
+            Defaults to None.
+
+    Raises:
+        Exception: If the API answers with a status in FATAL_STATUSES or MAX_FAILURES consecutive attempts failed with other errors, including 429.
+
+    Returns:
+        bytes: The body of the successful response.
+    """
+    failures = 0
+    while True:
+        await rate_limiter.acquire()
+        if window is not None:
+            await window.wait_if_throttled()
+        response: Optional[aiohttp.ClientResponse] = None
+        try:
+            async with backpressure:
+                started = time.monotonic()
+                async with session.get(url) as response:
+                    rate_limiter.update_from_response(response)
+
+                    if response.ok:
+                        backpressure.on_success(time.monotonic() - started)
+                        return await response.read()
+
+                    if response.status in FATAL_STATUSES:
+                        logger.error(f"{error_message} (HTTP {response.status}): {await response.text()}")
+                        raise Exception
+
+                    backpressure.on_failure()
+                    if response.status != 429:
+                        logger.error(f"{error_message} (HTTP {response.status}): {await response.text()}")
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            backpressure.on_failure()
+            logger.error(f"{error_message} ({e!r})")
+            response = None
+
+        # Throttled attempts count as well, so a 429 that never clears, e.g. without rate limit headers, does not retry forever
+        failures += 1
+        if failures >= MAX_FAILURES:
+            raise Exception(f"{error_message}: giving up after {failures} failed attempts")
+        if response is not None and (response.status == 429 or rate_limiter.retry_after is not None):
+            await rate_limiter.wait_for_limit_reset()
+        else:
+            await asyncio.sleep(backoff_delay(failures))
+
+
+async def get_pages(
+    session: aiohttp.ClientSession,
+    url: URL,
+    token_name: str,
+    parse: Callable[[bytes], Tuple[List[T], Optional[str]]],
+    rate_limiter: RateLimiter,
+    backpressure: BackpressureController,
+    error_message: str,
+    window: Optional[SlidingWindowLimiter] = None,
+) -> AsyncGenerator[List[T], None]:
+    """Requests the pages of a paginated endpoint one after another.
+
+    Each page is requested with get_with_retry and parsed into its items and the token of the next page. Pagination stops at the first page without a
+    next token.
+
+    Args:
+        session (aiohttp.ClientSession): The session used for the requests.
+        url (URL): The URL of the first page, built by encode_url.
+        token_name (str): The name of the token parameter, e.g. next_token or pagination_token.
+        parse (Callable[[bytes], Tuple[List[T], Optional[str]]]): Parses a response body into the items of the page and the next token, if any.
+        rate_limiter (RateLimiter): The rate limiter updated from each response.
+        backpressure (BackpressureController): The controller limiting the concurrent requests to the endpoint.
+        error_message (str): The message logged when a request fails, e.g. "Cannot search full tweets".
+        window (Optional[SlidingWindowLimiter], optional): The request window of the endpoint. Defaults to None.
+
+    Raises:
+        Exception: If the API answers a request with a status in FATAL_STATUSES or MAX_FAILURES consecutive attempts failed.
+
+    Yields:
+        List[T]: The items of each non-empty page.
+    """
+    page_url = url
+    while True:
+        logger.debug("get page url=%s", page_url)
+        items, next_token = parse(await get_with_retry(session, page_url, rate_limiter, backpressure, error_message, window))
+        if items:
+            yield items
+        # Released before the next page is requested, otherwise each page stays alive until the next one has arrived
+        del items
+
+        if not next_token:
+            break
+        page_url = with_page_token(url, token_name, next_token)
+
+
+def encode_url(url: str, params: Mapping[str, str], encoded_query: str = "") -> URL:
+    """Builds a request URL whose query string is encoded once.
+
+    aiohttp encodes a params mapping again for every request. Paginated endpoints send the same long field lists with each page, so they encode them once
+    and only append the page token per request with with_page_token.
+
+    Args:
+        url (str): The endpoint URL without query string.
+        params (Mapping[str, str]): The query parameters shared by all requests.
+        encoded_query (str, optional): Additional query parameters that are already URL-encoded, e.g. the constant field selectors. Defaults to "".
+
+    Returns:
+        URL: The URL including the encoded query string.
+    """
+    query = "&".join(part for part in (encoded_query, urlencode(params, quote_via=quote)) if part)
+    return URL(f"{url}?{query}", encoded=True)
+
+
+def with_page_token(url: URL, name: str, token: str) -> URL:
+    """Appends a pagination token to a URL built by encode_url.
+
+    Args:
+        url (URL): The URL including the query parameters shared by all pages.
+        name (str): The name of the token parameter, e.g. next_token or pagination_token.
+        token (str): The token of the requested page.
+
+    Returns:
+        URL: The URL of the requested page.
+    """
+    return URL(f"{url}&{name}={quote(token, safe='')}", encoded=True)
+
+
+async def iter_line_batches(content: aiohttp.StreamReader, chunk_size: int = 1 << 16, max_line_size: int = MAX_LINE_SIZE) -> AsyncGenerator[List[bytes], None]:
+    """Splits a newline delimited stream into the complete lines of each received chunk.
+
+    A line spanning several chunks is collected piece by piece and joined once it is complete, so long lines are not copied again with every chunk.
+
+    Args:
+        content (aiohttp.StreamReader): The body of a streaming response.
+        chunk_size (int, optional): Maximum number of bytes read at once. Defaults to 64 KiB.
+        max_line_size (int, optional): Maximum number of bytes buffered for a single line. Defaults to 16 MiB.
+
+    Raises:
+        Exception: A line exceeds max_line_size, e.g. because the stream never sends a line terminator.
+
+    Yields:
+        List[bytes]: The lines completed by the last chunk, without their line terminators. Keep-alive lines are included as empty bytes.
+    """
+    pending: List[bytes] = []
+    pending_size = 0
+    async for chunk in content.iter_chunked(chunk_size):
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size > max_line_size:
+                raise Exception(f"Stream line exceeds {max_line_size} bytes")
+            continue
+        if pending:
+            pending.append(lines[0])
+            lines[0] = b"".join(pending)
+        tail = lines.pop()
+        pending = [tail] if tail else []
+        pending_size = len(tail)
+        yield [line.rstrip(b"\r") for line in lines]
+    if pending:
+        yield [b"".join(pending).rstrip(b"\r")]
+
+
+async def iter_lines(content: aiohttp.StreamReader, chunk_size: int = 1 << 16, max_line_size: int = MAX_LINE_SIZE) -> AsyncGenerator[bytes, None]:
+    """Splits a newline delimited stream into lines.
+
+    Reading the stream in chunks and splitting them costs one await per chunk instead of one per line, which matters for bursty NDJSON streams.
+
+    Args:
+        content (aiohttp.StreamReader): The body of a streaming response.
+        chunk_size (int, optional): Maximum number of bytes read at once. Defaults to 64 KiB.
+        max_line_size (int, optional): Maximum number of bytes buffered for a single line. Defaults to 16 MiB.
+
+    Raises:
+        Exception: A line exceeds max_line_size.
+
+    Yields:
+        bytes: The next line without its line terminator. Keep-alive lines are yielded as empty bytes.
+    """
+    async for lines in iter_line_batches(content, chunk_size, max_line_size):
+        for line in lines:
+            yield line
@@ -6,6 +6,8 @@ from pydantic import BaseModel
 class TweetResponse(BaseModel):
     """Pydantic model to represent tweet response, as Twitter's own classes cannot be used due to inconsistencies of API and actual responses.
 
+    The endpoints create instances with ``model_construct``, as the dicts were just parsed from JSON and validating them would only copy them.
+
     Attributes
     ----------
     tweet : Dict[str, Any]
@@ -1,10 +1,30 @@
 import asyncio
 import logging
+import random
 import time
-from typing import Dict, Optional
+from collections import deque
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+from typing import Deque, Dict, List, Mapping, Optional, Tuple, Type
+
+import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# Documented app rate limits of the endpoints as (requests, window in seconds), keyed by URL path.
+# See https://developer.twitter.com/en/docs/twitter-api/rate-limits
+ENDPOINT_RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "/2/tweets": (300, 900),
+    "/2/users": (300, 900),
+    "/2/users/by": (300, 900),
+    "/2/tweets/search/all": (300, 900),
+    "/2/tweets/counts/all": (300, 900),
+    "/2/tweets/search/recent": (450, 900),
+    "/2/tweets/counts/recent": (300, 900),
+    "/2/tweets/:id/quote_tweets": (75, 900),
+    "/2/tweets/:id/retweeted_by": (75, 900),
+}
+
 
 class RateLimiter:
     """A utility class for handling rate limiting in API requests.
@@ -19,46 +39,108 @@ class RateLimiter:
                                    Defaults to None.
         reset_time (Optional[int]): The UTC epoch time in seconds when the rate limit
                                     will be reset. Defaults to None.
+        retry_after (Optional[int]): The number of seconds the API asked to wait before
+                                     retrying (Retry-After header). Defaults to None.
 
     Methods:
         wait_for_limit_reset: Asynchronously waits until the rate limit is reset if
                               the limit has been reached.
         update_limits(headers): Updates the rate limit remaining and reset time based
                                 on the HTTP headers from a response.
+        update_from_response(response): Updates the rate limit information from an
+                                        aiohttp response without copying its headers.
         should_wait(): Determines whether it is necessary to wait for the rate limit
                        reset based on the remaining requests.
+        acquire(): Asynchronously reserves one of the remaining requests before it is
+                   sent, waiting for the reset if none are left.
     """
 
+    __slots__ = ("remaining", "reset_time", "retry_after")
+
     def __init__(self) -> None:
         self.remaining: Optional[int] = None
         self.reset_time: Optional[int] = None
+        self.retry_after: Optional[int] = None
 
     async def wait_for_limit_reset(self) -> None:
         """Asynchronously waits until the rate limit is reset.
 
-        This method calculates the time to wait based on the current time and the
-        reset time of the rate limit. It then pauses execution for that duration,
-        effectively throttling the rate of API requests.
+        This method calculates the time to wait from the Retry-After header if the API
+        sent one, otherwise from the current time and the reset time of the rate limit,
+        and waits one second if neither is known. A random jitter of up to one second is added, so clients that were limited at
+        the same time do not all retry at the same moment. It then pauses execution for
+        that duration, effectively throttling the rate of API requests.
 
         Raises:
             Warning: If the reset time has passed but the method is called.
         """
-        if self.reset_time is not None:
-            wait_time = max(self.reset_time - int(time.time()), 1)  # Warte mindestens 1 Sekunde
-            logger.warning(f"Rate limit exceeded. Waiting {wait_time} seconds.")
-            await asyncio.sleep(wait_time)
+        if self.retry_after is not None:
+            wait_time = max(self.retry_after, 1) + random.uniform(0, 1)
+        elif self.reset_time is not None:
+            wait_time = max(self.reset_time - int(time.time()), 1) + random.uniform(0, 1)  # Warte mindestens 1 Sekunde
+        else:
+            # E.g. a 429 without rate limit headers, wait as long as for a reset time that has already passed
+            wait_time = 1 + random.uniform(0, 1)
+        logger.warning(f"Rate limit exceeded. Waiting {wait_time:.1f} seconds.")
+        await asyncio.sleep(wait_time)
+        # The window has been reset, so the remaining requests are unknown until the next response.
+        self.remaining = None
+        self.retry_after = None
 
-    def update_limits(self, headers: Dict[str, str]) -> None:
+    def update_limits(self, headers: Mapping[str, str]) -> None:
         """Updates the rate limit information based on the response headers.
 
         Args:
-            headers (Dict[str, str]): A dictionary of HTTP headers from an API response.
+            headers (Mapping[str, str]): The HTTP headers from an API response, e.g. the
+                                         case-insensitive multidict of an aiohttp response.
+
+        This method extracts the 'x-rate-limit-remaining', 'x-rate-limit-reset' and
+        'retry-after' values from the headers and updates the internal state of the rate limiter.
+        """
+        # The headers are present on almost every response, so index directly and only pay for the exception when they are missing.
+        # A missing header leaves the window unknown, so acquire() does not hold back requests on its account.
+        try:
+            self.remaining = int(headers["x-rate-limit-remaining"])
+        except KeyError:
+            self.remaining = None
+        try:
+            self.reset_time = int(headers["x-rate-limit-reset"])
+        except KeyError:
+            self.reset_time = None
+        try:
+            retry_after = headers["retry-after"]
+        except KeyError:
+            self.retry_after = None
+        else:
+            self.retry_after = _parse_retry_after(retry_after)
+
+    def update_from_response(self, response: aiohttp.ClientResponse) -> None:
+        """Updates the rate limit information from an API response.
+
+        Reads the response headers in place instead of copying them into a dict first.
+
+        Args:
+            response (aiohttp.ClientResponse): The response of a rate limited endpoint.
+        """
+        self.update_limits(response.headers)
 
-        This method extracts the 'x-rate-limit-remaining' and 'x-rate-limit-reset'
-        values from the headers and updates the internal state of the rate limiter.
+    async def acquire(self) -> None:
+        """Reserves one of the remaining requests of the rate limit window before sending it.
+
+        Concurrent requests each take one of the requests the last response reported as remaining, so together they do not send more requests than are
+        left and are answered with 429. If none are left, this waits until the window is reset. While nothing is known about the window, e.g. before the
+        first response, requests are not held back.
         """
-        self.remaining = int(headers.get("x-rate-limit-remaining", 1))
-        self.reset_time = int(headers.get("x-rate-limit-reset", 0))
+        if self.remaining is None:
+            return
+        if self.remaining <= 0:
+            if self.reset_time and self.reset_time <= time.time():
+                # The window has already been reset since the last response
+                self.remaining = None
+                return
+            await self.wait_for_limit_reset()
+            return
+        self.remaining -= 1
 
     def should_wait(self) -> bool:
         """Determines if waiting for rate limit reset is necessary.
@@ -68,3 +150,177 @@ class RateLimiter:
                   to wait until the rate limit is reset. False otherwise.
         """
         return self.remaining == 0
+
+
+def _parse_retry_after(value: str) -> Optional[int]:
+    """Parses a Retry-After header, given either in seconds or as HTTP date, into the seconds to wait. Returns None if it is malformed."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return max(int(parsedate_to_datetime(value).timestamp() - time.time()), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class SlidingWindowLimiter:
+    """Limits the requests to an endpoint to a known number per time window before they are sent.
+
+    RateLimiter only learns about a limit from the headers of the responses, so the first burst of concurrent requests can overshoot it and be answered
+    with 429. This limiter counts the requests sent in the last window and delays the next one until the oldest leaves the window.
+
+    Attributes:
+        limit (int): The maximum number of requests per window.
+        window (float): The length of the window in seconds.
+    """
+
+    __slots__ = ("limit", "window", "_timestamps")
+
+    def __init__(self, limit: int, window: float = 900) -> None:
+        self.limit = limit
+        self.window = window
+        self._timestamps: Deque[float] = deque()
+
+    @classmethod
+    def for_endpoint(cls, path: str) -> "SlidingWindowLimiter":
+        """Creates a limiter preseeded with the documented rate limit of an endpoint.
+
+        Args:
+            path (str): The URL path of the endpoint as listed in ENDPOINT_RATE_LIMITS, e.g. /2/tweets/search/all.
+
+        Returns:
+            SlidingWindowLimiter: A limiter for the endpoint.
+        """
+        limit, window = ENDPOINT_RATE_LIMITS[path]
+        return cls(limit, window)
+
+    async def wait_if_throttled(self) -> None:
+        """Waits until another request fits into the window and counts it."""
+        while True:
+            now = time.monotonic()
+            while self._timestamps and self._timestamps[0] <= now - self.window:
+                self._timestamps.popleft()
+            if len(self._timestamps) < self.limit:
+                self._timestamps.append(now)
+                return
+            wait_time = self._timestamps[0] + self.window - now
+            logger.info(f"Request window of {self.limit} requests is full. Waiting {wait_time:.1f} seconds.")
+            await asyncio.sleep(wait_time)
+
+
+class BackpressureController:
+    """Adapts the number of concurrent requests to an endpoint with additive increase and multiplicative decrease (AIMD).
+
+    Like TCP congestion control, the concurrency limit grows slowly while requests succeed and is cut back sharply when the API answers with 429 or a server
+    error. Concurrent callers of an endpoint share one controller, so together they converge to the request rate the API sustains instead of alternating
+    between bursts and long sleeps. The controller only limits concurrency; waiting for a rate limit reset remains the task of RateLimiter.
+
+    Attributes:
+        limit (float): The current concurrency limit. Requests are admitted while fewer than int(limit) are in flight.
+        min_limit (int): The lower bound of the concurrency limit.
+        max_limit (int): The upper bound of the concurrency limit.
+        alpha (float): The additive increase of the limit after a full window of successful requests.
+        beta (float): The factor the limit is multiplied with after a failed request.
+        target_latency (Optional[float]): If set, the limit only grows while responses arrive within this many seconds.
+        in_flight (int): The number of admitted requests that have not been released yet.
+
+    Examples:
+        Wrap each request of an endpoint::
+
+            async with backpressure:
+                async with session.get(url) as response:
+                    if response.ok:
+                        backpressure.on_success()
+                    else:
+                        backpressure.on_failure()
+    """
+
+    __slots__ = ("limit", "min_limit", "max_limit", "alpha", "beta", "target_latency", "in_flight", "_waiters")
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 50,
+        alpha: float = 0.5,
+        beta: float = 0.5,
+        target_latency: Optional[float] = None,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.alpha = alpha
+        self.beta = beta
+        self.target_latency = target_latency
+        self.in_flight = 0
+        # Futures are created in the loop of the waiting caller, so the controller is not bound to a single event loop.
+        self._waiters: List[asyncio.Future[None]] = []
+
+    async def acquire(self) -> None:
+        """Waits until a request is admitted under the current concurrency limit."""
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass a wake-up this caller can no longer use on to the next waiter
+                self._wake_up()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        """Releases an admitted request and wakes up waiting callers for the free slots."""
+        self.in_flight -= 1
+        self._wake_up()
+
+    def on_success(self, latency: Optional[float] = None) -> None:
+        """Increases the concurrency limit additively after a successful request.
+
+        Args:
+            latency (Optional[float], optional): The seconds until the response arrived. The limit does not grow if it exceeds target_latency.
+                Defaults to None.
+        """
+        if self.target_latency is not None and latency is not None and latency > self.target_latency:
+            return
+        # Grow by alpha per window of int(limit) requests, like TCP congestion avoidance.
+        self.limit = min(self.max_limit, self.limit + self.alpha / self.limit)
+        self._wake_up()
+
+    def on_failure(self) -> None:
+        """Decreases the concurrency limit multiplicatively after a throttled or failed request."""
+        self.limit = max(self.min_limit, self.limit * self.beta)
+        logger.debug(f"Reduced concurrency limit to {int(self.limit)}")
+
+    def _wake_up(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException], tb: Optional[TracebackType]) -> None:
+        self.release()
+
+
+def backoff_delay(attempt: int, base: float = 5.0, cap: float = 60.0) -> float:
+    """Calculates the delay before retrying a failed request with exponential backoff and jitter.
+
+    Args:
+        attempt (int): The number of consecutive failed attempts, starting at 1.
+        base (float, optional): The delay after the first failed attempt in seconds. Defaults to 5.
+        cap (float, optional): The maximum delay in seconds. Defaults to 60.
+
+    Returns:
+        float: The delay in seconds, randomized between half and the full exponential delay.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
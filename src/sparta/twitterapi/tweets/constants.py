@@ -1,14 +1,84 @@
+from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+from typing import Final, Mapping, Tuple
+from urllib.parse import parse_qsl, quote, urlencode
+
 # Created from the Twitter OpenAPI Spec
 # https://api.twitter.com/2/openapi.json
-FIELD_SELECTORS = "tweet.fields=id,created_at,text,author_id,in_reply_to_user_id,referenced_tweets,attachments,withheld,geo,entities,public_metrics,possibly_sensitive,source,lang,context_annotations,conversation_id,reply_settings&expansions=attachments.poll_ids,attachments.media_keys,author_id,entities.mentions.username,geo.place_id,in_reply_to_user_id,referenced_tweets.id,referenced_tweets.id.author_id&user.fields=created_at,description,entities,id,location,name,pinned_tweet_id,profile_image_url,protected,public_metrics,url,username,verified,withheld&media.fields=media_key,duration_ms,height,preview_image_url,type,url,width,public_metrics,alt_text,variants"  # noqa
-
-TWEET_FIELDS = "article,attachments,author_id,card_uri,context_annotations,conversation_id,created_at,display_text_range,edit_controls,edit_history_tweet_ids,entities,geo,id,in_reply_to_user_id,lang,media_metadata,note_tweet,possibly_sensitive,public_metrics,referenced_tweets,reply_settings,scopes,source,text,withheld"  # noqa
-EXPANSIONS = "article.cover_media,article.media_entities,attachments.media_keys,attachments.media_source_tweet,attachments.poll_ids,author_id,edit_history_tweet_ids,entities.mentions.username,geo.place_id,in_reply_to_user_id,entities.note.mentions.username,referenced_tweets.id,referenced_tweets.id.author_id"  # noqa
-USER_FIELDS = "affiliation,connection_status,created_at,description,entities,id,location,most_recent_tweet_id,name,pinned_tweet_id,profile_banner_url,profile_image_url,protected,public_metrics,receives_your_dm,subscription_type,url,username,verified,verified_type,withheld"  # noqa
-MEDIA_FIELDS = "media_key,duration_ms,height,preview_image_url,type,url,width,public_metrics,alt_text,variants"
-POLL_FIELDS = "duration_minutes,end_datetime,id,options,voting_status"
-PLACE_FIELDS = "contained_within,country,country_code,full_name,geo,id,name,place_type"
-USER_EXPANSIONS = "affiliation.user_id,most_recent_tweet_id,pinned_tweet_id"
-COMMUNITY_NOTE_FIELDS = "classification,created_at,deleted,id,rating_status,text"
-
-ENGAGEMENT_FIELDS = "errors", "measurement"
+FIELD_SELECTORS: Final[str] = (
+    "tweet.fields=id,created_at,text,author_id,in_reply_to_user_id,referenced_tweets,attachments,withheld,geo,entities,public_metrics,possibly_sensitive,source,lang,context_annotations,conversation_id,reply_settings&expansions=attachments.poll_ids,attachments.media_keys,author_id,entities.mentions.username,geo.place_id,in_reply_to_user_id,referenced_tweets.id,referenced_tweets.id.author_id&user.fields=created_at,description,entities,id,location,name,pinned_tweet_id,profile_image_url,protected,public_metrics,url,username,verified,withheld&media.fields=media_key,duration_ms,height,preview_image_url,type,url,width,public_metrics,alt_text,variants"  # noqa
+)
+# FIELD_SELECTORS parsed once at import, ready to be passed as request params
+FIELD_SELECTORS_PARAMS: Final[Mapping[str, str]] = MappingProxyType(dict(parse_qsl(FIELD_SELECTORS)))
+
+TWEET_FIELDS: Final[str] = (
+    "article,attachments,author_id,card_uri,context_annotations,conversation_id,created_at,display_text_range,edit_controls,edit_history_tweet_ids,entities,geo,id,in_reply_to_user_id,lang,media_metadata,note_tweet,possibly_sensitive,public_metrics,referenced_tweets,reply_settings,scopes,source,text,withheld"  # noqa
+)
+EXPANSIONS: Final[str] = (
+    "article.cover_media,article.media_entities,attachments.media_keys,attachments.media_source_tweet,attachments.poll_ids,author_id,edit_history_tweet_ids,entities.mentions.username,geo.place_id,in_reply_to_user_id,entities.note.mentions.username,referenced_tweets.id,referenced_tweets.id.author_id"  # noqa
+)
+USER_FIELDS: Final[str] = (
+    "affiliation,connection_status,created_at,description,entities,id,location,most_recent_tweet_id,name,pinned_tweet_id,profile_banner_url,profile_image_url,protected,public_metrics,receives_your_dm,subscription_type,url,username,verified,verified_type,withheld"  # noqa
+)
+MEDIA_FIELDS: Final[str] = "media_key,duration_ms,height,preview_image_url,type,url,width,public_metrics,alt_text,variants"
+POLL_FIELDS: Final[str] = "duration_minutes,end_datetime,id,options,voting_status"
+PLACE_FIELDS: Final[str] = "contained_within,country,country_code,full_name,geo,id,name,place_type"
+USER_EXPANSIONS: Final[str] = "affiliation.user_id,most_recent_tweet_id,pinned_tweet_id"
+COMMUNITY_NOTE_FIELDS: Final[str] = "classification,created_at,deleted,id,rating_status,text"
+
+
+@dataclass(frozen=True)
+class FieldSelection:
+    """The fields and expansions requested for each tweet by the tweet endpoints.
+
+    Every selector is sent as given and omitted if empty. Requesting only the fields a caller needs shrinks the response pages, and with them the time
+    spent receiving and parsing them.
+
+    Args:
+        tweet_fields (str): Comma separated tweet.fields. Defaults to TWEET_FIELDS.
+        expansions (str): Comma separated expansions. Defaults to EXPANSIONS.
+        user_fields (str): Comma separated user.fields. Defaults to USER_FIELDS.
+        media_fields (str): Comma separated media.fields. Defaults to MEDIA_FIELDS.
+        poll_fields (str): Comma separated poll.fields. Defaults to POLL_FIELDS.
+        place_fields (str): Comma separated place.fields. Defaults to PLACE_FIELDS.
+    """
+
+    tweet_fields: str = TWEET_FIELDS
+    expansions: str = EXPANSIONS
+    user_fields: str = USER_FIELDS
+    media_fields: str = MEDIA_FIELDS
+    poll_fields: str = POLL_FIELDS
+    place_fields: str = PLACE_FIELDS
+
+    @cached_property
+    def params(self) -> Mapping[str, str]:
+        """The selection as read-only request params, built on first use."""
+        params = {
+            "tweet.fields": self.tweet_fields,
+            "expansions": self.expansions,
+            "user.fields": self.user_fields,
+            "media.fields": self.media_fields,
+            "poll.fields": self.poll_fields,
+            "place.fields": self.place_fields,
+        }
+        return MappingProxyType({key: value for key, value in params.items() if value})
+
+    @cached_property
+    def query(self) -> str:
+        """The selection as URL-encoded query string, built on first use."""
+        return urlencode(self.params, quote_via=quote)
+
+
+# All fields and expansions, requested by the tweet endpoints unless told otherwise
+DEFAULT_FIELDS: Final[FieldSelection] = FieldSelection()
+# Only the tweet itself with its author ID and creation time, without any expansions
+MINIMAL_FIELDS: Final[FieldSelection] = FieldSelection(
+    tweet_fields="id,text,author_id,created_at", expansions="", user_fields="", media_fields="", poll_fields="", place_fields=""
+)
+
+# The field selectors requested for every tweet, built once at import. TWEET_FIELD_QUERY is the same selection already URL-encoded.
+TWEET_FIELD_PARAMS: Final[Mapping[str, str]] = DEFAULT_FIELDS.params
+TWEET_FIELD_QUERY: Final[str] = DEFAULT_FIELDS.query
+
+ENGAGEMENT_FIELDS: Final[Tuple[str, str]] = "errors", "measurement"
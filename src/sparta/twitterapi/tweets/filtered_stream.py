@@ -64,14 +64,16 @@ Examples:
             print(json.dumps(tweet_response.includes))
 """
 
-import json
+import asyncio
 import logging
-import os
+import random
 from datetime import datetime
 from typing import AsyncGenerator, Dict, List
 
 import aiohttp
+from pydantic_core import from_json
 
+from sparta.twitterapi.http import JSON_HEADERS, encode_url, get_session, iter_lines
 from sparta.twitterapi.models.tweet_response import TweetResponse
 from sparta.twitterapi.models.twitter_v2_spec import (
     AddOrDeleteRulesRequest,
@@ -80,14 +82,21 @@ from sparta.twitterapi.models.twitter_v2_spec import (
     Rule,
     RulesLookupResponse,
 )
-from sparta.twitterapi.tweets.constants import EXPANSIONS, MEDIA_FIELDS, PLACE_FIELDS, POLL_FIELDS, TWEET_FIELDS, USER_FIELDS
+from sparta.twitterapi.rate_limiter import RateLimiter
+from sparta.twitterapi.tweets.constants import TWEET_FIELD_QUERY
+from sparta.twitterapi.utils import format_datetime
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+SCHEMA_WARNING_INTERVAL = 1000  # Log only every n-th schema mismatch of a stream
+RECONNECT_INITIAL_DELAY = 1.0  # Seconds before the first reconnect attempt, doubled for every failed attempt
+RECONNECT_MAX_DELAY = 320.0  # Upper bound of the reconnect delay
+# The stream sends keep-alive newlines every 20 seconds, so a connection that stays silent this long is considered dead (e.g. dropped by a proxy).
+STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=120)
+
+# Shared by all calls, so the rate limit learned by earlier calls is respected. Looking up and changing rules are limited separately.
+_get_rules_rate_limiter = RateLimiter()
+_change_rules_rate_limiter = RateLimiter()
 
 
 async def get_rules(ids: List[str] = None) -> AsyncGenerator[Rule, None]:
@@ -105,30 +114,38 @@ async def get_rules(ids: List[str] = None) -> AsyncGenerator[Rule, None]:
     Yields:
         Iterator[AsyncGenerator[Rule, None]]: A Twitter Rule object.
     """
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "max_results": str(500),  # Max results per response
-        }
-        if ids:
-            params["ids"] = ",".join(ids)
+    rate_limiter = _get_rules_rate_limiter
+    session = get_session()
+    params: Dict[str, str] = {
+        "max_results": str(500),  # Max results per response
+    }
+    if ids:
+        params["ids"] = ",".join(ids)
+
+    while True:
+        await rate_limiter.acquire()
+        async with session.get("https://api.twitter.com/2/tweets/search/stream/rules", params=params) as response:
+            rate_limiter.update_from_response(response)
+
+            if response.status == 429:
+                await rate_limiter.wait_for_limit_reset()
+                continue
 
-        while True:
-            async with session.get("https://api.twitter.com/2/tweets/search/stream/rules", params=params) as response:
-                if not response.ok:
-                    raise Exception(f"Cannot get rules (HTTP {response.status}): {await response.text()}")
+            if not response.ok:
+                raise Exception(f"Cannot get rules (HTTP {response.status}): {await response.text()}")
 
-                lookupResponse = RulesLookupResponse.model_validate_json(await response.text())
+            lookupResponse = RulesLookupResponse.model_validate_json(await response.read())
 
-                if not lookupResponse.data:
-                    return
+            if not lookupResponse.data:
+                return
 
-                for rule in lookupResponse.data:
-                    yield rule
+            for rule in lookupResponse.data:
+                yield rule
 
-                if lookupResponse.meta.next_token:
-                    params["pagination_token"] = lookupResponse.meta.next_token
-                else:
-                    return
+            if lookupResponse.meta.next_token:
+                params["pagination_token"] = lookupResponse.meta.next_token
+            else:
+                return
 
 
 async def add_or_delete_rules(rules: AddOrDeleteRulesRequest, dry_run: bool = False) -> AddOrDeleteRulesResponse:
@@ -149,29 +166,44 @@ async def add_or_delete_rules(rules: AddOrDeleteRulesRequest, dry_run: bool = Fa
     """
     params: Dict[str, str] = {"dry_run": str(dry_run)}
 
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.post("https://api.twitter.com/2/tweets/search/stream/rules", data=rules.model_dump_json(), params=params) as response:
+    rate_limiter = _change_rules_rate_limiter
+    session = get_session()
+    data = rules.model_dump_json(exclude_none=True)
+    while True:
+        await rate_limiter.acquire()
+        async with session.post("https://api.twitter.com/2/tweets/search/stream/rules", data=data, params=params, headers=JSON_HEADERS) as response:
+            rate_limiter.update_from_response(response)
+
+            if response.status == 429:
+                await rate_limiter.wait_for_limit_reset()
+                continue
+
             if not response.ok:
                 raise Exception(f"Cannot add/delete rules (HTTP {response.status}): {await response.text()}")
-            return AddOrDeleteRulesResponse.model_validate_json(await response.text())
+            return AddOrDeleteRulesResponse.model_validate_json(await response.read())
 
 
 async def get_stream(
     backfill_minutes: int = 5,
     start_time: datetime = None,
     end_time: datetime = None,
+    validate_schema: bool = False,
 ) -> AsyncGenerator[TweetResponse, None]:
     """Streams Tweets matching the stream's active rule set.
 
+    The stream is reopened with a jittered exponential backoff when the connection drops or stalls, or the API answers with 429 or a server error.
+
     Args:
         backfill_minutes (int, optional): The number of minutes of backfill requested. Defaults to 5.
         start_time (datetime): The oldest UTC timestamp from which the Tweets will be provided. Timestamp is in second granularity and is inclusive
             (i.e. 12:00:01 includes the first second of the minute). Defaults to None.
         end_time (datetime): The newest, most recent UTC timestamp to which the Tweets will be provided. Timestamp is in second granularity and is exclusive
             (i.e. 12:00:01 excludes the first second of the minute). Defaults to None.
+        validate_schema (bool, optional): If true, every streamed tweet is checked against the OpenAPI schema and mismatches are logged. The check is
+            also enabled when debug logging is on. Defaults to False.
 
     Raises:
-        Exception: Cannot open the stream due to an http error.
+        Exception: Cannot open the stream due to an http error other than 429 or 5xx.
 
     Returns:
         AsyncGenerator[TweetResponse, None]: AsyncGenerator that yields TweetResponses.
@@ -179,42 +211,55 @@ async def get_stream(
     Yields:
         Iterator[AsyncGenerator[TweetResponse, None]]: A TweetResponse Object.
     """
-    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None), read_bufsize=2**21) as session:
-        params: Dict[str, str] = {
-            "tweet.fields": TWEET_FIELDS,
-            "expansions": EXPANSIONS,
-            "user.fields": USER_FIELDS,
-            "media.fields": MEDIA_FIELDS,
-            "poll.fields": POLL_FIELDS,
-            "place.fields": PLACE_FIELDS,
-            "backfill_minutes": str(backfill_minutes),
-        }
-
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        while True:
-            logger.info("Start stream")
-            async with session.get("https://api.twitter.com/2/tweets/search/stream", params=params) as response:
-                if not response.ok:
+    session = get_session()
+    params: Dict[str, str] = {
+        "backfill_minutes": str(backfill_minutes),
+    }
+
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+
+    url = encode_url("https://api.twitter.com/2/tweets/search/stream", params, TWEET_FIELD_QUERY)
+    schema_mismatches = 0
+    reconnects = 0
+    delay = 0.0
+    while True:
+        if delay:
+            # Jitter spreads the reconnects of many clients after an outage instead of hitting the API at the same moment.
+            wait_time = delay * random.uniform(0.5, 1.5)
+            logger.warning(f"Reconnecting stream in {wait_time:.1f} seconds (reconnect {reconnects})")
+            await asyncio.sleep(wait_time)
+        logger.info("Start stream")
+        try:
+            async with session.get(url, timeout=STREAM_TIMEOUT) as response:
+                if response.status == 429 or response.status >= 500:
+                    # E.g. too many connections after a disconnect, retried like a dropped connection
+                    logger.warning(f"Stream unavailable (HTTP {response.status}): {await response.text()}")
+                elif not response.ok:
                     raise Exception(f"Cannot open stream (HTTP {response.status}): {await response.text()}")
-                while True:
-                    line = await response.content.readline()
-                    if line == b"":
-                        break
-                    if line != b"\r\n":
-                        try:
-                            json_line = json.loads(line)
-                            tweet = TweetResponse(tweet=json_line.get("data", {}), includes=json_line.get("includes", {}))
-                            yield tweet
+                else:
+                    delay = 0.0
+                    async for line in iter_lines(response.content):
+                        if line:
                             try:
-                                FilteredStreamingTweetResponse.model_validate(json_line)
+                                json_line = from_json(line)
+                                tweet = TweetResponse.model_construct(tweet=json_line.get("data", {}), includes=json_line.get("includes", {}))
+                                yield tweet
+                                if validate_schema or logger.isEnabledFor(logging.DEBUG):
+                                    try:
+                                        FilteredStreamingTweetResponse.model_validate(json_line)
+                                    except Exception as e:
+                                        # Schema drift usually affects every tweet, so only every SCHEMA_WARNING_INTERVAL-th mismatch is logged
+                                        if schema_mismatches % SCHEMA_WARNING_INTERVAL == 0:
+                                            logger.warning(f"Inconsistent twitter OpenAPI documentation ({schema_mismatches + 1} mismatches so far) {e}")
+                                            logger.warning(line)
+                                        schema_mismatches += 1
                             except Exception as e:
-                                print(e)
-                                logger.warn(f"Inconsistent twitter OpenAPI documentation {e}")
-                                logger.warn(line)
-                        except Exception as e:
-                            logger.error(f"get_stream encountered unexpected exception: {e}")
-                            logger.error(line)
+                                logger.error(f"get_stream encountered unexpected exception: {e}")
+                                logger.error(line)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Stream disconnected: {e!r}")
+        reconnects += 1
+        delay = min(max(delay * 2, RECONNECT_INITIAL_DELAY), RECONNECT_MAX_DELAY)
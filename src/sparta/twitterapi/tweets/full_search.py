@@ -25,6 +25,27 @@ Examples:
             print(json.dumps(tweet_response.tweet))
             print(json.dumps(tweet_response.includes))
 
+    Get Tweets from full search page by page::
+
+        import os
+        os.environ["BEARER_TOKEN"] = "xxxxxxxxxxx"
+        from datetime import datetime
+        from sparta.twitterapi.tweets.full_search import get_full_search_pages
+
+        query = '(#test OR @projekt_sparta) -is:retweet'
+        starttime = datetime(2021, 6, 1, 0, 0)
+        endtime = datetime(2021, 10, 4, 0, 0)
+
+        async for page in get_full_search_pages(query=query, start_time=starttime, end_time=endtime):
+            print(len(page))
+
+    Get only the tweet text, author and creation time, without expansions::
+
+        from sparta.twitterapi.tweets.constants import MINIMAL_FIELDS
+
+        async for tweet_response in get_full_search(query=query, start_time=starttime, end_time=endtime, fields=MINIMAL_FIELDS):
+            print(tweet_response.tweet["text"])
+
     Get estimated number for full search query::
 
         import os
@@ -41,34 +62,43 @@ Examples:
         )
 """
 
-import asyncio
+import functools
 import logging
-import os
+from collections import OrderedDict
 from datetime import datetime
-from typing import AsyncGenerator, Dict
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, Union
 
 import aiohttp
+from pydantic import BaseModel
 
+from sparta.twitterapi.http import encode_url, get_pages, get_session
 from sparta.twitterapi.models.tweet_response import TweetResponse
-from sparta.twitterapi.models.twitter_v2_spec import Get2TweetsCountsAllResponse, SearchCount
-from sparta.twitterapi.rate_limiter import RateLimiter
-from sparta.twitterapi.tweets.constants import EXPANSIONS, MEDIA_FIELDS, PLACE_FIELDS, POLL_FIELDS, TWEET_FIELDS, USER_FIELDS
+from sparta.twitterapi.models.twitter_v2_spec import SearchCount
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter
+from sparta.twitterapi.tweets.constants import DEFAULT_FIELDS, FieldSelection
+from sparta.twitterapi.utils import format_datetime, parse_tweet_page, prefetch
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+# Calls share one rate limiter, controller and request window per endpoint, so the learned rate limit outlives a call and concurrent searches
+# together adapt to the request rate the endpoint sustains.
+_search_rate_limiter = RateLimiter()
+_count_rate_limiter = RateLimiter()
+_search_backpressure = BackpressureController()
+_count_backpressure = BackpressureController()
+_search_window = SlidingWindowLimiter.for_endpoint("/2/tweets/search/all")
+_count_window = SlidingWindowLimiter.for_endpoint("/2/tweets/counts/all")
 
 
 async def get_full_search(
     query: str,
-    start_time: datetime = None,
-    end_time: datetime = None,
+    start_time: Union[str, datetime] = None,
+    end_time: Union[str, datetime] = None,
     since_id: str = None,
     until_id: str = None,
     sort_order: str = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    fields: FieldSelection = DEFAULT_FIELDS,
 ) -> AsyncGenerator[TweetResponse, None]:
     """Asynchronously retrieves tweets that match a specified search query.
 
@@ -77,11 +107,16 @@ async def get_full_search(
 
     Args:
         query (str): The search query for matching Tweets. Refer to Twitter API documentation for details on query format and limitations.
-        start_time (datetime, optional): The oldest UTC timestamp from which tweets will be provided. Inclusive and in second granularity.
-        end_time (datetime, optional): The newest UTC timestamp to which tweets will be provided. Exclusive and in second granularity.
+        start_time (Union[str, datetime], optional): The oldest UTC timestamp from which tweets will be provided. Inclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        end_time (Union[str, datetime], optional): The newest UTC timestamp to which tweets will be provided. Exclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
         since_id (str, optional): Returns results with a Tweet ID greater than this ID.
         until_id (str, optional): Returns results with a Tweet ID less than this ID.
         sort_order (str, optional): The order in which to return results (e.g., 'recency' or 'relevancy').
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
+        fields (FieldSelection, optional): The fields and expansions requested for each tweet, e.g. MINIMAL_FIELDS. Defaults to all of them.
 
     Yields:
         TweetResponse: An object representing the tweet data for each tweet that matches the query.
@@ -92,66 +127,98 @@ async def get_full_search(
     Note:
         The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
     """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "query": query,
-            "tweet.fields": TWEET_FIELDS,
-            "expansions": EXPANSIONS,
-            "user.fields": USER_FIELDS,
-            "media.fields": MEDIA_FIELDS,
-            "poll.fields": POLL_FIELDS,
-            "place.fields": PLACE_FIELDS,
-            "max_results": str(100),  # Max results per response
-        }
-
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if since_id:
-            params["since_id"] = since_id
-        if until_id:
-            params["until_id"] = until_id
-        if sort_order:
-            params["sort_order"] = sort_order
-
-        while True:
-            logger.debug(f"search recent params={params}")
-            async with session.get("https://api.twitter.com/2/tweets/search/all", params=params) as response:
-                if response.status == 400:
-                    logger.error(f"Cannot search full tweets (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot search full tweets (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                response_json = await response.json()
-
-                for tweet in response_json.get("data", []):
-                    yield TweetResponse(tweet=tweet, includes=response_json.get("includes", {}))
-
-                if "next_token" in response_json.get("meta"):
-                    params["next_token"] = response_json.get("meta").get("next_token")
-                else:
-                    break
+    async for page in get_full_search_pages(query, start_time, end_time, since_id, until_id, sort_order, session, fields):
+        for tweet_response in page:
+            yield tweet_response
+
+
+async def get_full_search_pages(
+    query: str,
+    start_time: Union[str, datetime] = None,
+    end_time: Union[str, datetime] = None,
+    since_id: str = None,
+    until_id: str = None,
+    sort_order: str = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    fields: FieldSelection = DEFAULT_FIELDS,
+) -> AsyncGenerator[List[TweetResponse], None]:
+    """Asynchronously retrieves tweets that match a specified search query, one page of up to 100 tweets at a time.
+
+    Yielding whole pages suits consumers that process tweets in batches (e.g. database inserts), as they pay the async iteration overhead once per page
+    instead of once per tweet. It handles rate limiting using an internal instance of RateLimiter, automatically pausing requests if the rate limit is
+    exceeded.
+
+    Args:
+        query (str): The search query for matching Tweets. Refer to Twitter API documentation for details on query format and limitations.
+        start_time (Union[str, datetime], optional): The oldest UTC timestamp from which tweets will be provided. Inclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        end_time (Union[str, datetime], optional): The newest UTC timestamp to which tweets will be provided. Exclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        since_id (str, optional): Returns results with a Tweet ID greater than this ID.
+        until_id (str, optional): Returns results with a Tweet ID less than this ID.
+        sort_order (str, optional): The order in which to return results (e.g., 'recency' or 'relevancy').
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
+        fields (FieldSelection, optional): The fields and expansions requested for each tweet, e.g. MINIMAL_FIELDS. Defaults to all of them.
+
+    Yields:
+        List[TweetResponse]: The tweets of one response page that match the query.
+
+    Raises:
+        Exception: If an HTTP error occurs that prevents retrieving the tweets or if the query parameters are invalid.
+
+    Note:
+        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response. The next page is requested
+        while the current one is being processed.
+    """
+    async for page in prefetch(_iter_full_search_pages(query, start_time, end_time, since_id, until_id, sort_order, session, fields)):
+        yield page
+
+
+async def _iter_full_search_pages(
+    query: str,
+    start_time: Union[str, datetime, None],
+    end_time: Union[str, datetime, None],
+    since_id: Optional[str],
+    until_id: Optional[str],
+    sort_order: Optional[str],
+    session: Optional[aiohttp.ClientSession],
+    fields: FieldSelection,
+) -> AsyncGenerator[List[TweetResponse], None]:
+    """Requests the pages of a full-archive search one after another. See get_full_search_pages for the arguments."""
+    if session is None:
+        session = get_session()
+    params: Dict[str, str] = {
+        "query": query,
+        "max_results": str(100),  # Max results per response
+    }
+
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+    if since_id:
+        params["since_id"] = since_id
+    if until_id:
+        params["until_id"] = until_id
+    if sort_order:
+        params["sort_order"] = sort_order
+
+    # Authors recur across the pages of a run, so recently seen objects are shared instead of kept once per page
+    parse = functools.partial(parse_tweet_page, interned=OrderedDict())
+    url = encode_url("https://api.twitter.com/2/tweets/search/all", params, fields.query)
+    async for page in get_pages(session, url, "next_token", parse, _search_rate_limiter, _search_backpressure, "Cannot search full tweets", _search_window):
+        yield page
 
 
 async def get_full_search_count(
     query: str,
-    start_time: datetime = None,
-    end_time: datetime = None,
+    start_time: Union[str, datetime] = None,
+    end_time: Union[str, datetime] = None,
     since_id: str = None,
     until_id: str = None,
     granularity: str = "hour",
+    session: Optional[aiohttp.ClientSession] = None,
 ) -> AsyncGenerator[SearchCount, None]:
     """Asynchronously retrieves the count of tweets matching a specified search query, aggregated according to a specified granularity (e.g., hourly).
 
@@ -160,11 +227,15 @@ async def get_full_search_count(
 
     Args:
         query (str): The search query for matching Tweets. Refer to Twitter API documentation for query format and limitations.
-        start_time (datetime, optional): The oldest UTC timestamp from which tweet counts will be provided. Inclusive and in second granularity.
-        end_time (datetime, optional): The newest UTC timestamp to which tweet counts will be provided. Exclusive and in second granularity.
+        start_time (Union[str, datetime], optional): The oldest UTC timestamp from which tweet counts will be provided. Inclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        end_time (Union[str, datetime], optional): The newest UTC timestamp to which tweet counts will be provided. Exclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
         since_id (str, optional): Returns results with a Tweet ID greater than this ID.
         until_id (str, optional): Returns results with a Tweet ID less than this ID.
         granularity (str, optional): The granularity for the search counts results ('minute', 'hour', or 'day'). Defaults to 'hour'.
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
 
     Yields:
         SearchCount: An object representing the tweet count data for each interval according to the specified granularity.
@@ -173,51 +244,62 @@ async def get_full_search_count(
         Exception: If an invalid granularity is specified or if an HTTP error occurs that prevents retrieving the tweet counts.
 
     Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response. The next page is requested
+        while the counts of the current one are being processed.
     """
     if granularity not in ["minute", "hour", "day"]:
         raise Exception(f"Wrong granularity. Given granularity: {granularity}. Possible values = minute, hour, day")
 
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "query": query,
-        }
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if since_id:
-            params["since_id"] = since_id
-        if until_id:
-            params["until_id"] = until_id
-        if granularity:
-            params["granularity"] = granularity
-
-        while True:
-            logger.debug(f"search recent params={params}")
-            async with session.get("https://api.twitter.com/2/tweets/counts/all", params=params) as response:
-                if response.status == 400:
-                    logger.error(f"Cannot get full tweet count (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot search full tweet counts (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                counts = Get2TweetsCountsAllResponse.model_validate_json(await response.text())
-                if counts.data:
-                    for count in counts.data:
-                        yield count
-
-                if counts.meta and counts.meta.next_token:
-                    params["next_token"] = counts.meta.next_token
-                else:
-                    break
+    async for page in prefetch(_iter_full_search_count_pages(query, start_time, end_time, since_id, until_id, granularity, session)):
+        for count in page:
+            yield count
+
+
+async def _iter_full_search_count_pages(
+    query: str,
+    start_time: Union[str, datetime, None],
+    end_time: Union[str, datetime, None],
+    since_id: Optional[str],
+    until_id: Optional[str],
+    granularity: str,
+    session: Optional[aiohttp.ClientSession],
+) -> AsyncGenerator[List[SearchCount], None]:
+    """Requests the pages of a full-archive count one after another. See get_full_search_count for the arguments."""
+    if session is None:
+        session = get_session()
+    params: Dict[str, str] = {
+        "query": query,
+    }
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+    if since_id:
+        params["since_id"] = since_id
+    if until_id:
+        params["until_id"] = until_id
+    if granularity:
+        params["granularity"] = granularity
+
+    url = encode_url("https://api.twitter.com/2/tweets/counts/all", params)
+    async for page in get_pages(
+        session, url, "next_token", _parse_count_page, _count_rate_limiter, _count_backpressure, "Cannot search full tweet counts", _count_window
+    ):
+        yield page
+
+
+class _CountPage(BaseModel):
+    """The parts of a full-archive count page that are used.
+
+    Get2TweetsCountsAllResponse also validates the errors and every meta field of each page. Only the counts are validated here, so they keep their
+    parsed datetimes, and meta is left as parsed JSON.
+    """
+
+    data: Optional[List[SearchCount]] = None
+    meta: Optional[Dict[str, Any]] = None
+
+
+def _parse_count_page(body: bytes) -> Tuple[List[SearchCount], Optional[str]]:
+    """Parses a page of the full-archive count endpoint into its counts and the token of the next page, if any."""
+    counts = _CountPage.model_validate_json(body)
+    return counts.data or [], (counts.meta or {}).get("next_token")
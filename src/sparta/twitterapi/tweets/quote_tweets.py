@@ -22,36 +22,54 @@ Examples:
             async for tweet_response in get_quote_tweets(tweet_id):
                 print(json.dumps(tweet_response.tweet))
                 print(json.dumps(tweet_response.includes))
+
+    Get quoted Tweets of several Tweets concurrently::
+
+        async for tweet_id, tweet_response in get_quote_tweets_many(tweet_ids, max_concurrency=8):
+            print(tweet_id, json.dumps(tweet_response.tweet))
 """
 
 import asyncio
+import functools
 import logging
-import os
+from collections import OrderedDict
 from datetime import datetime
-from typing import AsyncGenerator, Dict
+from typing import AsyncGenerator, Dict, List, Optional, Tuple, Union
 
 import aiohttp
 
+from sparta.twitterapi.http import encode_url, get_pages, get_session
 from sparta.twitterapi.models.tweet_response import TweetResponse
-from sparta.twitterapi.rate_limiter import RateLimiter
-
-# from sparta.twitterapi.models.twitter_v2_spec import Get2TweetsIdQuoteTweetsResponse
-from sparta.twitterapi.tweets.constants import EXPANSIONS, MEDIA_FIELDS, PLACE_FIELDS, POLL_FIELDS, TWEET_FIELDS, USER_FIELDS
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter
+from sparta.twitterapi.tweets.constants import DEFAULT_FIELDS, FieldSelection
+from sparta.twitterapi.utils import format_datetime, merge, parse_tweet_page, prefetch
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+# Shared by all quote tweet requests, e.g. of get_quote_tweets_many, so they respect the rate limit learned by earlier calls, stay within the request
+# window and adapt their concurrency to the rate the endpoint sustains.
+_rate_limiter = RateLimiter()
+_backpressure = BackpressureController()
+_window = SlidingWindowLimiter.for_endpoint("/2/tweets/:id/quote_tweets")
+
+QUOTE_TWEET_CACHE_SIZE = 128  # Number of (id, start_time, end_time, since_id, until_id, fields, session) results kept by get_quote_tweets(cache=True)
+
+# The session is part of the key, since a session with another token may not see the same tweets. None stands for the shared session.
+_CacheKey = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str], FieldSelection, Optional[aiohttp.ClientSession]]
+_cache: "OrderedDict[_CacheKey, List[TweetResponse]]" = OrderedDict()
+# Retrievals in progress, so concurrent callers with the same arguments share one. Tasks belong to an event loop, hence the loop in the key.
+_inflight: Dict[Tuple[asyncio.AbstractEventLoop, _CacheKey], "asyncio.Task[List[TweetResponse]]"] = {}
 
 
 async def get_quote_tweets(
     id: str,
-    start_time: datetime = None,
-    end_time: datetime = None,
+    start_time: Union[str, datetime] = None,
+    end_time: Union[str, datetime] = None,
     since_id: str = None,
     until_id: str = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    cache: bool = False,
+    fields: FieldSelection = DEFAULT_FIELDS,
 ) -> AsyncGenerator[TweetResponse, None]:
     """Asynchronously retrieves tweets quoting a specified tweet.
 
@@ -61,10 +79,18 @@ async def get_quote_tweets(
 
     Args:
         id (str): The ID of the tweet for which to retrieve quote tweets.
-        start_time (datetime, optional): The oldest UTC timestamp from which quote tweets will be provided. Inclusive and in second granularity.
-        end_time (datetime, optional): The newest UTC timestamp to which quote tweets will be provided. Exclusive and in second granularity.
+        start_time (Union[str, datetime], optional): The oldest UTC timestamp from which quote tweets will be provided. Inclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        end_time (Union[str, datetime], optional): The newest UTC timestamp to which quote tweets will be provided. Exclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
         since_id (str, optional): Returns quote tweets with an ID greater than this ID.
         until_id (str, optional): Returns quote tweets with an ID less than this ID.
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
+        cache (bool, optional): If true, the quote tweets are retrieved completely before the first one is yielded and kept in an in-process LRU cache of
+            QUOTE_TWEET_CACHE_SIZE results. Repeated and concurrent calls with the same arguments, including the session, are served from it without
+            further requests. The cached TweetResponse objects are shared between callers. Defaults to False.
+        fields (FieldSelection, optional): The fields and expansions requested for each tweet, e.g. MINIMAL_FIELDS. Defaults to all of them.
 
     Yields:
         TweetResponse: An object representing a tweet that quotes the specified tweet.
@@ -73,58 +99,153 @@ async def get_quote_tweets(
         Exception: If an HTTP error occurs that prevents retrieving the quote tweets or if the tweet ID is invalid.
 
     Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response. The next page is requested
+        while the tweets of the current one are being processed.
+    """
+    if cache:
+        for tweet_response in await _get_cached_quote_tweets(id, start_time, end_time, since_id, until_id, session, fields):
+            yield tweet_response
+        return
+
+    async for page in prefetch(_iter_quote_tweet_pages(id, start_time, end_time, since_id, until_id, session, fields)):
+        for tweet_response in page:
+            yield tweet_response
+
+
+async def _get_cached_quote_tweets(
+    id: str,
+    start_time: Union[str, datetime, None],
+    end_time: Union[str, datetime, None],
+    since_id: Optional[str],
+    until_id: Optional[str],
+    session: Optional[aiohttp.ClientSession],
+    fields: FieldSelection,
+) -> List[TweetResponse]:
+    """Returns all quote tweets from the cache, from a retrieval in progress, or by retrieving and caching them. See get_quote_tweets for the arguments."""
+    # Formatted first, so equal points in time given as datetime or string (or in different timezones) share one cache entry
+    start = format_datetime(start_time) if start_time else None
+    end = format_datetime(end_time) if end_time else None
+    key: _CacheKey = (id, start, end, since_id, until_id, fields, session)
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    loop = asyncio.get_running_loop()
+    task = _inflight.get((loop, key))
+    if task is None:
+        # The retrieval runs in its own task rather than in the first caller, so cancelling any caller does not cancel it for the others
+        task = loop.create_task(_retrieve_quote_tweets(key))
+        _inflight[(loop, key)] = task
+        task.add_done_callback(functools.partial(_retrieval_done, (loop, key)))
+    # Shielded, so a cancelled caller does not cancel the retrieval the other callers wait for
+    return await asyncio.shield(task)
+
+
+async def _retrieve_quote_tweets(key: _CacheKey) -> List[TweetResponse]:
+    """Retrieves all quote tweets for a cache key and caches them."""
+    id, start_time, end_time, since_id, until_id, fields, session = key
+    pages = _iter_quote_tweet_pages(id, start_time, end_time, since_id, until_id, session, fields)
+    result = [tweet_response async for page in pages for tweet_response in page]
+    _cache[key] = result
+    while len(_cache) > QUOTE_TWEET_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+
+def _retrieval_done(inflight_key: Tuple[asyncio.AbstractEventLoop, _CacheKey], task: "asyncio.Task[List[TweetResponse]]") -> None:
+    """Forgets a finished retrieval, so the next caller is served from the cache or retries after an error."""
+    del _inflight[inflight_key]
+    if not task.cancelled():
+        task.exception()  # Retrieved here, so asyncio does not warn if every caller was cancelled before it finished
+
+
+def clear_quote_tweet_cache() -> None:
+    """Removes all results cached by get_quote_tweets(cache=True)."""
+    _cache.clear()
+
+
+async def _iter_quote_tweet_pages(
+    id: str,
+    start_time: Union[str, datetime, None],
+    end_time: Union[str, datetime, None],
+    since_id: Optional[str],
+    until_id: Optional[str],
+    session: Optional[aiohttp.ClientSession],
+    fields: FieldSelection,
+) -> AsyncGenerator[List[TweetResponse], None]:
+    """Requests the pages of quote tweets one after another. See get_quote_tweets for the arguments."""
+    if session is None:
+        session = get_session()
+    params: Dict[str, str] = {
+        "max_results": str(100),  # Max results per response
+    }
+
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+    if since_id:
+        params["since_id"] = since_id
+    if until_id:
+        params["until_id"] = until_id
+
+    # Authors recur across the pages of a run, so recently seen objects are shared instead of kept once per page
+    parse = functools.partial(parse_tweet_page, interned=OrderedDict())
+    url = encode_url(f"https://api.twitter.com/2/tweets/{id}/quote_tweets", params, fields.query)
+    async for page in get_pages(session, url, "pagination_token", parse, _rate_limiter, _backpressure, "Cannot search quote tweets", _window):
+        yield page
+
+
+async def _tag_quote_tweets(
+    id: str, quote_tweets: AsyncGenerator[TweetResponse, None], semaphore: asyncio.Semaphore
+) -> AsyncGenerator[Tuple[str, TweetResponse], None]:
+    """Pairs each quote tweet with the ID of the tweet it quotes, paginating only while holding the semaphore."""
+    async with semaphore:
+        async for tweet_response in quote_tweets:
+            yield id, tweet_response
+
+
+async def get_quote_tweets_many(
+    ids: List[str],
+    start_time: Union[str, datetime] = None,
+    end_time: Union[str, datetime] = None,
+    max_concurrency: int = 8,
+    session: Optional[aiohttp.ClientSession] = None,
+    fields: FieldSelection = DEFAULT_FIELDS,
+) -> AsyncGenerator[Tuple[str, TweetResponse], None]:
+    """Asynchronously retrieves the quote tweets of several tweets concurrently.
+
+    The quote tweets of each tweet are paginated one page after another, so fetching many tweets in a loop waits for every page in turn. This function runs
+    up to max_concurrency get_quote_tweets at the same time over the keep-alive connections of the shared session and yields the results as they arrive.
+
+    Args:
+        ids (List[str]): The IDs of the tweets for which to retrieve quote tweets.
+        start_time (Union[str, datetime], optional): The oldest UTC timestamp from which quote tweets will be provided. Inclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        end_time (Union[str, datetime], optional): The newest UTC timestamp to which quote tweets will be provided. Exclusive and in second granularity.
+            A string is sent as given and must be formatted as YYYY-MM-DDTHH:mm:ssZ.
+        max_concurrency (int, optional): Maximum number of tweets paginated at the same time, which bounds the requests in flight. Defaults to 8.
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
+        fields (FieldSelection, optional): The fields and expansions requested for each tweet, e.g. MINIMAL_FIELDS. Defaults to all of them.
+
+    Raises:
+        Exception: If max_concurrency is less than 1 or retrieving the quote tweets of any tweet fails. The remaining requests are cancelled.
+
+    Yields:
+        Tuple[str, TweetResponse]: The ID of the quoted tweet and a tweet quoting it. Quote tweets of different tweets are interleaved.
     """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "tweet.fields": TWEET_FIELDS,
-            "expansions": EXPANSIONS,
-            "user.fields": USER_FIELDS,
-            "media.fields": MEDIA_FIELDS,
-            "poll.fields": POLL_FIELDS,
-            "place.fields": PLACE_FIELDS,
-            "max_results": str(100),  # Max results per response
-        }
-
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if since_id:
-            params["since_id"] = since_id
-        if until_id:
-            params["until_id"] = until_id
-
-        while True:
-            logger.debug(f"search recent params={params}")
-            async with session.get(f"https://api.twitter.com/2/tweets/{id}/quote_tweets", params=params) as response:
-                if response.status == 400:
-                    logger.error(f"Cannot search recent tweets (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot search recent tweets (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                response_json = await response.json()
-
-                for tweet in response_json.get("data", []):
-                    yield TweetResponse(tweet=tweet, includes=response_json.get("includes", {}))
-
-                # try:
-                #     Get2TweetsIdQuoteTweetsResponse.model_validate(response_json)
-                # except Exception as e:
-                #     logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
-                #     # logger.warning(response_text)
-                if "next_token" in response_json.get("meta"):
-                    params["pagination_token"] = response_json.get("meta").get("next_token")
-                else:
-                    break
+    if max_concurrency < 1:
+        raise Exception(f"max_concurrency must be at least 1, got {max_concurrency}")
+    if session is None:
+        session = get_session()
+    # Formatted once instead of once per tweet
+    if start_time:
+        start_time = format_datetime(start_time)
+    if end_time:
+        end_time = format_datetime(end_time)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    streams = [_tag_quote_tweets(id, get_quote_tweets(id, start_time, end_time, session=session, fields=fields), semaphore) for id in ids]
+    async for item in merge(*streams):
+        yield item
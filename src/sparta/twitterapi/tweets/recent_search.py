@@ -42,26 +42,29 @@ Examples:
         )
 """
 
-import asyncio
-import json
 import logging
-import os
 from datetime import datetime
-from typing import AsyncGenerator, Dict, Optional
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 import aiohttp
+from pydantic import BaseModel
 
+from sparta.twitterapi.http import encode_url, get_pages, get_session
 from sparta.twitterapi.models.tweet_response import TweetResponse
-from sparta.twitterapi.models.twitter_v2_spec import Get2TweetsCountsRecentResponse, SearchCount
-from sparta.twitterapi.rate_limiter import RateLimiter
-from sparta.twitterapi.tweets.constants import EXPANSIONS, MEDIA_FIELDS, PLACE_FIELDS, POLL_FIELDS, TWEET_FIELDS, USER_FIELDS
+from sparta.twitterapi.models.twitter_v2_spec import SearchCount
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter
+from sparta.twitterapi.tweets.constants import TWEET_FIELD_QUERY
+from sparta.twitterapi.utils import format_datetime, parse_tweet_page, prefetch
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+# Calls share one rate limiter, controller and request window per endpoint
+_search_rate_limiter = RateLimiter()
+_count_rate_limiter = RateLimiter()
+_search_backpressure = BackpressureController()
+_count_backpressure = BackpressureController()
+_search_window = SlidingWindowLimiter.for_endpoint("/2/tweets/search/recent")
+_count_window = SlidingWindowLimiter.for_endpoint("/2/tweets/counts/recent")
 
 
 async def get_recent_search(
@@ -71,6 +74,7 @@ async def get_recent_search(
     since_id: str = None,
     until_id: str = None,
     sort_order: str = None,
+    session: Optional[aiohttp.ClientSession] = None,
 ) -> AsyncGenerator[TweetResponse, None]:
     """Asynchronously retrieves tweets from the last 7 days that match the specified query.
 
@@ -85,6 +89,8 @@ async def get_recent_search(
         since_id (str, optional): Returns results with a Tweet ID greater than this ID.
         until_id (str, optional): Returns results with a Tweet ID less than this ID.
         sort_order (str, optional): The order in which to return results (e.g., 'recency' or 'relevancy'). Defaults to None.
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
 
     Yields:
         TweetResponse: An object representing the tweet data for each tweet that matches the query.
@@ -93,64 +99,47 @@ async def get_recent_search(
         Exception: If an HTTP error occurs that prevents retrieving the tweets or if the query parameters are invalid.
 
     Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response. The next page is requested
+        while the tweets of the current one are being processed.
     """
+    async for page in prefetch(_iter_recent_search_pages(query, start_time, end_time, since_id, until_id, sort_order, session)):
+        for tweet_response in page:
+            yield tweet_response
 
-    rate_limiter = RateLimiter()
-    next_token: Optional[str] = None
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "query": query,
-            "tweet.fields": TWEET_FIELDS,
-            "expansions": EXPANSIONS,
-            "user.fields": USER_FIELDS,
-            "media.fields": MEDIA_FIELDS,
-            "poll.fields": POLL_FIELDS,
-            "place.fields": PLACE_FIELDS,
-            "max_results": str(100),  # Max results per response
-        }
-
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if since_id:
-            params["since_id"] = since_id
-        if until_id:
-            params["until_id"] = until_id
-        if sort_order:
-            params["sort_order"] = sort_order
-
-        while True:
-            if next_token:
-                params["next_token"] = next_token
-
-            logger.debug(f"search recent params={params}")
-            async with session.get("https://api.twitter.com/2/tweets/search/recent", params=params) as response:
-                if response.status == 400:
-                    logger.error(f"Cannot search recent tweets (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot search recent tweets (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                response_json = await response.json()
-
-                for tweet in response_json.get("data", []):
-                    yield TweetResponse(tweet=tweet, includes=response_json.get("includes", {}))
-
-                if "next_token" in response_json.get("meta"):
-                    params["next_token"] = response_json.get("meta").get("next_token")
-                else:
-                    break
+
+async def _iter_recent_search_pages(
+    query: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    since_id: Optional[str],
+    until_id: Optional[str],
+    sort_order: Optional[str],
+    session: Optional[aiohttp.ClientSession],
+) -> AsyncGenerator[List[TweetResponse], None]:
+    """Requests the pages of a recent search one after another. See get_recent_search for the arguments."""
+    if session is None:
+        session = get_session()
+    params: Dict[str, str] = {
+        "query": query,
+        "max_results": str(100),  # Max results per response
+    }
+
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+    if since_id:
+        params["since_id"] = since_id
+    if until_id:
+        params["until_id"] = until_id
+    if sort_order:
+        params["sort_order"] = sort_order
+
+    url = encode_url("https://api.twitter.com/2/tweets/search/recent", params, TWEET_FIELD_QUERY)
+    async for page in get_pages(
+        session, url, "next_token", parse_tweet_page, _search_rate_limiter, _search_backpressure, "Cannot search recent tweets", _search_window
+    ):
+        yield page
 
 
 async def get_recent_search_count(
@@ -160,6 +149,7 @@ async def get_recent_search_count(
     since_id: str = None,
     until_id: str = None,
     granularity: str = None,
+    session: Optional[aiohttp.ClientSession] = None,
 ) -> AsyncGenerator[SearchCount, None]:
     """Asynchronously retrieves the count of tweets matching a specified search query from the last 7 days, aggregated according to a specified granularity.
 
@@ -174,6 +164,8 @@ async def get_recent_search_count(
         since_id (str, optional): Returns results with a Tweet ID greater than this ID.
         until_id (str, optional): Returns results with a Tweet ID less than this ID.
         granularity (str, optional): The granularity for the search counts results (e.g., 'minute', 'hour', or 'day').
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
 
     Yields:
         SearchCount: An object representing the tweet count data for each interval according to the specified granularity.
@@ -183,55 +175,63 @@ async def get_recent_search_count(
         invalid.
 
     Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response. The next page is requested
+        while the counts of the current one are being processed.
     """
 
     if granularity not in ["minute", "hour", "day"]:
         raise Exception(f"Wrong granularity. Given granularity: {granularity}. Possible values = minute, hour, day")
 
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "query": query,
-        }
-        if start_time:
-            params["start_time"] = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if end_time:
-            params["end_time"] = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        if since_id:
-            params["since_id"] = since_id
-        if until_id:
-            params["until_id"] = until_id
-        if granularity:
-            params["granularity"] = granularity
-
-        while True:
-            logger.debug(f"search recent params={params}")
-            async with session.get("https://api.twitter.com/2/tweets/counts/recent", params=params) as response:
-                if response.status == 400:
-                    logger.error(f"Cannot get recent tweet counts (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot get recent tweet counts (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                response_text = await response.text()
-                response_json = json.loads(response_text)
-
-                counts = Get2TweetsCountsRecentResponse.model_validate(response_json)
-                if counts.data:
-                    for count in counts.data:
-                        yield count
-
-                if counts.meta and counts.meta.next_token:
-                    params["next_token"] = counts.meta.next_token
-                else:
-                    break
+    async for page in prefetch(_iter_recent_search_count_pages(query, start_time, end_time, since_id, until_id, granularity, session)):
+        for count in page:
+            yield count
+
+
+async def _iter_recent_search_count_pages(
+    query: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    since_id: Optional[str],
+    until_id: Optional[str],
+    granularity: str,
+    session: Optional[aiohttp.ClientSession],
+) -> AsyncGenerator[List[SearchCount], None]:
+    """Requests the pages of a recent count one after another. See get_recent_search_count for the arguments."""
+    if session is None:
+        session = get_session()
+    params: Dict[str, str] = {
+        "query": query,
+    }
+    if start_time:
+        params["start_time"] = format_datetime(start_time)
+    if end_time:
+        params["end_time"] = format_datetime(end_time)
+    if since_id:
+        params["since_id"] = since_id
+    if until_id:
+        params["until_id"] = until_id
+    if granularity:
+        params["granularity"] = granularity
+
+    url = encode_url("https://api.twitter.com/2/tweets/counts/recent", params)
+    async for page in get_pages(
+        session, url, "next_token", _parse_count_page, _count_rate_limiter, _count_backpressure, "Cannot get recent tweet counts", _count_window
+    ):
+        yield page
+
+
+class _CountPage(BaseModel):
+    """The parts of a recent count page that are used.
+
+    Get2TweetsCountsRecentResponse also validates the errors and every meta field of each page. Only the counts are validated here, and meta is left
+    as parsed JSON.
+    """
+
+    data: Optional[List[SearchCount]] = None
+    meta: Optional[Dict[str, Any]] = None
+
+
+def _parse_count_page(body: bytes) -> Tuple[List[SearchCount], Optional[str]]:
+    """Parses a page of the recent count endpoint into its counts and the token of the next page, if any."""
+    counts = _CountPage.model_validate_json(body)
+    return counts.data or [], (counts.meta or {}).get("next_token")
@@ -19,26 +19,30 @@ Examples:
             print(user.model_dump_json())
 """
 
-import asyncio
 import logging
-import os
-from typing import AsyncGenerator, Dict, Optional
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
 
 import aiohttp
+from pydantic import TypeAdapter
+from pydantic_core import from_json
 
+from sparta.twitterapi.http import encode_url, get_pages, get_session
 from sparta.twitterapi.models.twitter_v2_spec import Get2TweetsIdRetweetedByResponse, User
-from sparta.twitterapi.rate_limiter import RateLimiter
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter
 from sparta.twitterapi.tweets.constants import TWEET_FIELDS, USER_EXPANSIONS, USER_FIELDS
+from sparta.twitterapi.utils import prefetch
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+_USERS_ADAPTER = TypeAdapter(List[User])
 
+# Shared by all calls, so the rate limit learned by earlier calls is respected
+_rate_limiter = RateLimiter()
+_backpressure = BackpressureController()
+_window = SlidingWindowLimiter.for_endpoint("/2/tweets/:id/retweeted_by")
 
-async def get_retweets(id: str) -> AsyncGenerator[User, None]:
+
+async def get_retweets(id: str, session: Optional[aiohttp.ClientSession] = None) -> AsyncGenerator[User, None]:
     """Asynchronously retrieves users who have retweeted a specified tweet.
 
     This function queries the Twitter API to find users who have retweeted the tweet corresponding to the given ID. It handles rate limiting using an internal
@@ -47,6 +51,8 @@ async def get_retweets(id: str) -> AsyncGenerator[User, None]:
 
     Args:
         id (str): The ID of the tweet for which to retrieve retweeters.
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
 
     Yields:
         User: An object representing a Twitter user who has retweeted the specified tweet.
@@ -55,51 +61,40 @@ async def get_retweets(id: str) -> AsyncGenerator[User, None]:
         Exception: If an HTTP error occurs that prevents retrieving the retweets or if the tweet ID is invalid.
 
     Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response. The next page is requested
+        while the users of the current one are being processed.
     """
-    rate_limiter = RateLimiter()
-    pagination_token: Optional[str] = None
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "tweet.fields": TWEET_FIELDS,
-            "expansions": USER_EXPANSIONS,
-            "user.fields": USER_FIELDS,
-            "max_results": str(100),  # Max results per response
-        }
-
-        while True:
-            if pagination_token:
-                params["pagination_token"] = pagination_token
-
-            logger.debug(f"search recent params={params}")
-            async with session.get(f"https://api.twitter.com/2/tweets/{id}/retweeted_by", params=params) as response:
-                if response.status == 400:
-                    logger.error(f"Cannot search retweets (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot search retweets (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                response_json = await response.json()
-
-                for user in response_json.get("data", []):
-                    yield User.model_validate(user)
-
-                try:
-                    Get2TweetsIdRetweetedByResponse.model_validate(response_json)
-                except Exception as e:
-                    logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
-                    # logger.warning(response_text)
-
-                if "next_token" in response_json.get("meta"):
-                    params["pagination_token"] = response_json.get("meta").get("next_token")
-                else:
-                    break
+    async for page in prefetch(_iter_retweet_pages(id, session)):
+        for user in page:
+            yield user
+
+
+async def _iter_retweet_pages(id: str, session: Optional[aiohttp.ClientSession]) -> AsyncGenerator[List[User], None]:
+    """Requests the pages of retweeting users one after another. See get_retweets for the arguments."""
+    if session is None:
+        session = get_session()
+    params: Dict[str, str] = {
+        "tweet.fields": TWEET_FIELDS,
+        "expansions": USER_EXPANSIONS,
+        "user.fields": USER_FIELDS,
+        "max_results": str(100),  # Max results per response
+    }
+
+    url = encode_url(f"https://api.twitter.com/2/tweets/{id}/retweeted_by", params)
+    async for page in get_pages(session, url, "pagination_token", _parse_retweet_page, _rate_limiter, _backpressure, "Cannot search retweets", _window):
+        yield page
+
+
+def _parse_retweet_page(body: bytes) -> Tuple[List[User], Optional[str]]:
+    """Parses a page of the retweeted_by endpoint into its users and the token of the next page, if any."""
+    response_json = from_json(body)
+    users = _USERS_ADAPTER.validate_python(response_json.get("data") or [])
+
+    # The users are validated above already, so the whole page is only checked against the spec when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            Get2TweetsIdRetweetedByResponse.model_validate(response_json)
+        except Exception as e:
+            logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
+
+    return users, (response_json.get("meta") or {}).get("next_token")
@@ -20,70 +20,84 @@ Examples:
         async for tweet_response in get_tweets_by_id(['1511275800758300675', '1546866845180887040']):
             print(json.dumps(tweet_response.tweet))
             print(json.dumps(tweet_response.includes))
+
+    Any number of IDs can be passed. They are requested in batches of 100, several batches at a time::
+
+        async for tweet_response in get_tweets_by_id(tweet_ids, max_concurrency=5):
+            print(tweet_response.tweet["id"])
 """
 
+import asyncio
 import logging
-import os
-from typing import AsyncGenerator, Dict, List
+from typing import AsyncGenerator, List, Optional
 
 import aiohttp
+from pydantic_core import from_json
 
+from sparta.twitterapi.http import encode_url, get_session, get_with_retry
 from sparta.twitterapi.models.tweet_response import TweetResponse
-from sparta.twitterapi.rate_limiter import RateLimiter
-from sparta.twitterapi.tweets.constants import EXPANSIONS, MEDIA_FIELDS, PLACE_FIELDS, POLL_FIELDS, TWEET_FIELDS, USER_FIELDS
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter
+from sparta.twitterapi.tweets.constants import TWEET_FIELD_QUERY
+from sparta.twitterapi.utils import merge
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+TWEET_LOOKUP_BATCH_SIZE = 100  # Maximum number of IDs per request of the tweets lookup endpoint
+
+# Shared by all calls, so the rate limit learned by earlier calls is respected
+_rate_limiter = RateLimiter()
+_backpressure = BackpressureController()
+_window = SlidingWindowLimiter.for_endpoint("/2/tweets")
 
 
-async def get_tweets_by_id(ids: List[str]) -> AsyncGenerator[TweetResponse, None]:
+async def get_tweets_by_id(ids: List[str], session: Optional[aiohttp.ClientSession] = None, max_concurrency: int = 5) -> AsyncGenerator[TweetResponse, None]:
     """Asynchronously retrieves tweets by their IDs.
 
     This function handles the retrieval of tweets from Twitter's API based on a list of tweet IDs. It respects the rate limiting by utilizing an internal
-    RateLimiter instance. If the rate limit is exceeded, the function will automatically wait until it can proceed with requests.
+    RateLimiter instance. If the rate limit is exceeded, the function will automatically wait until it can proceed with requests. Failed requests are
+    retried with backoff.
 
     Args:
-        ids (List[str]): A list of tweet IDs for which to retrieve tweets. Up to 100 IDs can be included in a single request.
+        ids (List[str]): A list of tweet IDs for which to retrieve tweets. Repeated IDs are looked up once, in batches of up to
+            TWEET_LOOKUP_BATCH_SIZE IDs.
+        session (aiohttp.ClientSession, optional): The session used for the requests. It must send the Authorization header and is not closed
+            afterwards. Defaults to the shared session.
+        max_concurrency (int, optional): Maximum number of batches requested at the same time. Defaults to 5.
 
     Returns:
         AsyncGenerator[TweetResponse, None]: An asynchronous generator that yields TweetResponse objects for each tweet.
 
     Raises:
-        Exception: If an HTTP error occurs that prevents retrieving the tweets.
+        Exception: If max_concurrency is less than 1, a request is rejected with a status in FATAL_STATUSES, e.g. HTTP 401, or MAX_FAILURES
+            consecutive attempts of a batch failed. The remaining requests are cancelled.
 
     Yields:
-        TweetResponse: An object representing the tweet data for each given tweet ID.
+        TweetResponse: An object representing the tweet data for each given tweet ID. Tweets of different batches are yielded in the order the batches
+            arrive.
     """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "ids": ",".join(ids),
-            "tweet.fields": TWEET_FIELDS,
-            "expansions": EXPANSIONS,
-            "user.fields": USER_FIELDS,
-            "media.fields": MEDIA_FIELDS,
-            "poll.fields": POLL_FIELDS,
-            "place.fields": PLACE_FIELDS,
-        }
-        logger.debug(f"search recent params={params}")
-        while True:
-            async with session.get("https://api.twitter.com/2/tweets", params=params) as response:
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    raise Exception(f"Cannot search tweets {params} (HTTP {response.status}): {await response.text()}")
-
-                response_json = await response.json()
-
-                for tweet in response_json.get("data", []):
-                    yield TweetResponse(tweet=tweet, includes=response_json.get("includes", {}))
-
-            break
+    if max_concurrency < 1:
+        raise Exception(f"max_concurrency must be at least 1, got {max_concurrency}")
+    if session is None:
+        session = get_session()
+    # Repeated IDs would only spend rate limit
+    ids = list(dict.fromkeys(ids))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    batches: List[List[str]] = []
+    for start in range(0, len(ids), TWEET_LOOKUP_BATCH_SIZE):
+        end = start + TWEET_LOOKUP_BATCH_SIZE
+        batches.append(ids[start:end])
+    async for tweet_response in merge(*(_get_tweet_batch(batch, session, semaphore) for batch in batches)):
+        yield tweet_response
+
+
+async def _get_tweet_batch(ids: List[str], session: aiohttp.ClientSession, semaphore: asyncio.Semaphore) -> AsyncGenerator[TweetResponse, None]:
+    """Requests the tweets of up to TWEET_LOOKUP_BATCH_SIZE IDs in one request, holding the semaphore meanwhile."""
+    url = encode_url("https://api.twitter.com/2/tweets", {"ids": ",".join(ids)}, TWEET_FIELD_QUERY)
+    logger.debug("tweet lookup url=%s", url)
+    async with semaphore:
+        body = await get_with_retry(session, url, _rate_limiter, _backpressure, "Cannot search tweets", _window)
+
+    response_json = from_json(body)
+    includes = response_json.get("includes") or {}
+    for tweet in response_json.get("data") or ():
+        yield TweetResponse.model_construct(tweet=tweet, includes=includes)
@@ -28,26 +28,29 @@ Examples:
 
         asyncio.run(main())
 """
-import logging
-import os
-from typing import Optional
 
-import aiohttp
+import logging
+import time
+from typing import Optional, Tuple
 
+from sparta.twitterapi.http import get_session
 from sparta.twitterapi.models.twitter_v2_spec import Get2UsageTweetsResponse, Usage
 
 logger = logging.getLogger(__name__)
 
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+# Last usage response and its monotonic fetch time. The usage counts change slowly, so repeated polls within the ttl are served from here.
+_usage_cache: Optional[Tuple[float, Optional[Usage]]] = None
 
 
-async def get_usage() -> Optional[Usage]:
+async def get_usage(ttl: float = 60.0) -> Optional[Usage]:
     """Fetches usage data from the Twitter API.
 
     This function retrieves detailed API usage data for the current application, including rate limits and usage counts for specific endpoints.
     The usage endpoint provides insights into how the API is being used and allows developers to monitor limits to prevent overages.
 
+    Args:
+        ttl (float, optional): Seconds a fetched response is reused for subsequent calls. Set to 0 to always query the API. Defaults to 60.
+
     Returns:
         Optional[Usage]: A `Usage` object containing detailed API usage information.
 
@@ -59,10 +62,16 @@ async def get_usage() -> Optional[Usage]:
         >>> if usage_data:
         >>>     print(usage_data.project_id, usage_data.daily_project_usage, usage_data.project_cap)
     """
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get("https://api.twitter.com/2/usage/tweets") as response:
-            if not response.ok:
-                logging.error(f"Cannot usage data (HTTP {response.status}): {await response.text()}")
-
-                raise Exception
-            return Get2UsageTweetsResponse.model_validate(await response.json()).data
+    global _usage_cache
+    if _usage_cache is not None and time.monotonic() - _usage_cache[0] < ttl:
+        return _usage_cache[1]
+
+    session = get_session()
+    async with session.get("https://api.twitter.com/2/usage/tweets") as response:
+        if not response.ok:
+            logging.error(f"Cannot usage data (HTTP {response.status}): {await response.text()}")
+
+            raise Exception
+        usage = Get2UsageTweetsResponse.model_validate_json(await response.read()).data
+        _usage_cache = (time.monotonic(), usage)
+        return usage
@@ -27,25 +27,42 @@ Examples:
 
         async for user in get_following_by_id('1422600096324231168'):
             print(user.model_dump_json())
+
+
+    Get the followers of several users concurrently::
+
+        import os
+        os.environ["BEARER_TOKEN"] = "xxxxxxxxxxx"
+        from sparta.twitterapi.users.follower import get_followers_many
+
+        async for id, user in get_followers_many(['1422600096324231168', '3088296873']):
+            print(id, user.model_dump_json())
 """
 
 import asyncio
 import logging
-import os
-from typing import AsyncGenerator, Dict
+import re
+from typing import AsyncGenerator, Dict, List, Tuple, Type, Union
 
 import aiohttp
+from pydantic import ValidationError
+from yarl import URL
 
-from sparta.twitterapi.models.twitter_v2_spec import Get2UsersIdFollowersResponse, User
-from sparta.twitterapi.rate_limiter import RateLimiter
+from sparta.twitterapi.http import FATAL_STATUSES, MAX_FAILURES, encode_url, get_session, with_page_token
+from sparta.twitterapi.models.twitter_v2_spec import Get2UsersIdFollowersResponse, Get2UsersIdFollowingResponse, User
+from sparta.twitterapi.rate_limiter import RateLimiter, backoff_delay
 from sparta.twitterapi.tweets.constants import USER_FIELDS
+from sparta.twitterapi.utils import merge, prefetch
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+# The token of the next page, found in the raw body so it can be requested before the current page is validated. Quotes inside JSON strings are
+# escaped, so user descriptions cannot match it.
+_NEXT_TOKEN_RE = re.compile(rb'"next_token"\s*:\s*"([^"]+)"')
+
+# Shared by all calls, so concurrent lookups of many users respect the rate limit learned by the others
+_followers_rate_limiter = RateLimiter()
+_following_rate_limiter = RateLimiter()
 
 
 async def get_followers_by_id(id: str, max_resulsts: int = 1000) -> AsyncGenerator[User, None]:
@@ -64,52 +81,23 @@ async def get_followers_by_id(id: str, max_resulsts: int = 1000) -> AsyncGenerat
 
     Yields:
         Iterator[AsyncGenerator[User, None]]: A Twitter User object.
-    """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "user.fields": USER_FIELDS,
-            # "tweet.fields": tweet_fields,
-            # "expansions": user_expansions,
-            "max_results": str(max_resulsts),  # Max results per response
-        }
-
-        while True:
-            logger.debug(f"Search users params={params}")
-            async with session.get(f"https://api.twitter.com/2/users/{id}/followers", params=params) as response:
-                if response.status in [400, 401, 402, 403, 404]:
-                    logger.error(f"Cannot get followers for user {id} (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    logger.error(f"Cannot get followers for user {id} with params: {params} (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
-                    continue
-
-                response_json = await response.json()
 
-                try:
-                    users = Get2UsersIdFollowersResponse.model_validate(response_json)
-                except Exception as e:
-                    logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
-                    logger.warning(response_json)
-
-                if not users.data:
-                    raise Exception(users)
-
-                for user in users.data:
-                    yield user
+    Note:
+        The next page is requested while the users of the current one are being processed.
+    """
+    params: Dict[str, str] = {
+        "user.fields": USER_FIELDS,
+        # "tweet.fields": tweet_fields,
+        # "expansions": user_expansions,
+        "max_results": str(max_resulsts),  # Max results per response
+    }
 
-                if "next_token" in response_json.get("meta"):
-                    params["pagination_token"] = response_json.get("meta").get("next_token")
-                else:
-                    break
+    url = encode_url(f"https://api.twitter.com/2/users/{id}/followers", params)
+    async for body in prefetch(_iter_user_pages(url, _followers_rate_limiter, f"Cannot get followers for user {id}")):
+        users = _parse_user_page(body, Get2UsersIdFollowersResponse)
+        del body  # Only the users are kept while they are consumed
+        for user in users:
+            yield user
 
 
 async def get_following_by_id(id: str, max_resulsts: int = 1000) -> AsyncGenerator[User, None]:
@@ -128,49 +116,142 @@ async def get_following_by_id(id: str, max_resulsts: int = 1000) -> AsyncGenerat
 
     Yields:
         Iterator[AsyncGenerator[User, None]]: A Twitter User object.
+
+    Note:
+        The next page is requested while the users of the current one are being processed.
     """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "user.fields": USER_FIELDS,
-            # "tweet.fields": tweet_fields,
-            # "expansions": user_expansions,
-            "max_results": str(max_resulsts),  # Max results per response
-        }
-
-        while True:
-            logger.debug(f"Search users params={params}")
-            async with session.get(f"https://api.twitter.com/2/users/{id}/following", params=params) as response:
-                if response.status in [400, 401, 402, 403, 404]:
-                    logger.error(f"Cannot get followed users for {id} (HTTP {response.status}): {await response.text()}")
-                    raise Exception
-
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
+    params: Dict[str, str] = {
+        "user.fields": USER_FIELDS,
+        # "tweet.fields": tweet_fields,
+        # "expansions": user_expansions,
+        "max_results": str(max_resulsts),  # Max results per response
+    }
+
+    url = encode_url(f"https://api.twitter.com/2/users/{id}/following", params)
+    async for body in prefetch(_iter_user_pages(url, _following_rate_limiter, f"Cannot get followed users for {id}")):
+        users = _parse_user_page(body, Get2UsersIdFollowingResponse)
+        del body  # Only the users are kept while they are consumed
+        for user in users:
+            yield user
+
+
+async def _tag_users(id: str, users: AsyncGenerator[User, None], semaphore: asyncio.Semaphore) -> AsyncGenerator[Tuple[str, User], None]:
+    """Pairs each user with the ID of the user that was looked up, paginating only while holding the semaphore."""
+    async with semaphore:
+        async for user in users:
+            yield id, user
+
+
+async def get_followers_many(ids: List[str], max_resulsts: int = 1000, max_concurrency: int = 8) -> AsyncGenerator[Tuple[str, User], None]:
+    """Returns the followers of several users concurrently.
+
+    The followers of each user are paginated one page after another, so crawling many users in a loop waits for every page in turn. This function runs
+    up to max_concurrency get_followers_by_id at the same time over the keep-alive connections of the shared session and yields the results as they
+    arrive.
+
+    Args:
+        ids (List[str]): The IDs of the Users to lookup.
+        max_resulsts (int, optional): The maximum number of results per response. Defaults to 1000.
+        max_concurrency (int, optional): Maximum number of users paginated at the same time, which bounds the requests in flight. Defaults to 8.
+
+    Raises:
+        Exception: If max_concurrency is less than 1 or getting the followers of any user fails. The remaining requests are cancelled.
+
+    Yields:
+        Tuple[str, User]: The ID of the looked up User and one of its followers. Followers of different users are interleaved.
+    """
+    if max_concurrency < 1:
+        raise Exception(f"max_concurrency must be at least 1, got {max_concurrency}")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    streams = [_tag_users(id, get_followers_by_id(id, max_resulsts), semaphore) for id in ids]
+    async for item in merge(*streams):
+        yield item
+
+
+async def _iter_user_pages(base_url: URL, rate_limiter: RateLimiter, error_message: str) -> AsyncGenerator[bytes, None]:
+    """Requests the pages of a follows lookup endpoint one after another.
+
+    The pages are yielded unparsed. The next page is requested as soon as the current one was read, while the consumer validates it.
+
+    Args:
+        base_url (URL): The URL of the first page, built with encode_url.
+        rate_limiter (RateLimiter): The rate limiter of the endpoint, updated from each response.
+        error_message (str): The message logged when a request fails, e.g. "Cannot get followers for user 123".
+
+    Raises:
+        Exception: Cannot get the search result due to an http error, or MAX_FAILURES consecutive attempts failed.
+
+    Yields:
+        bytes: The body of a page.
+    """
+    session = get_session()
+    url = base_url
+    failures = 0
+    while True:
+        logger.debug("Search users url=%s", url)
+        try:
+            async with session.get(url) as response:
+                rate_limiter.update_from_response(response)
 
                 if not response.ok:
-                    logger.error(f"Cannot get followed users for {id} with params: {params} (HTTP {response.status}): {await response.text()}")
-                    await asyncio.sleep(10)
+                    if response.status in FATAL_STATUSES:
+                        logger.error(f"{error_message} (HTTP {response.status}): {await response.text()}")
+                        raise Exception
+
+                    if response.status != 429:
+                        logger.error(f"{error_message} with url: {url} (HTTP {response.status}): {await response.text()}")
+                    # Throttled attempts count as well, so a 429 that never clears does not retry forever
+                    failures += 1
+                    if failures >= MAX_FAILURES:
+                        raise Exception(f"{error_message}: giving up after {failures} failed attempts")
+                    if response.status == 429 or rate_limiter.retry_after is not None:
+                        await rate_limiter.wait_for_limit_reset()
+                    else:
+                        await asyncio.sleep(backoff_delay(failures))
                     continue
+                failures = 0
+
+                body = await response.read()
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            logger.error(f"{error_message} ({e!r})")
+            failures += 1
+            if failures >= MAX_FAILURES:
+                raise Exception(f"{error_message}: giving up after {failures} failed attempts") from e
+            await asyncio.sleep(backoff_delay(failures))
+            continue
+
+        yield body
+
+        match = _NEXT_TOKEN_RE.search(body)
+        del body  # Released before the next page is requested
+        if match:
+            url = with_page_token(base_url, "pagination_token", match.group(1).decode())
+        else:
+            break
+
 
-                response_json = await response.json()
+def _parse_user_page(body: bytes, response_model: Type[Union[Get2UsersIdFollowersResponse, Get2UsersIdFollowingResponse]]) -> List[User]:
+    """Validates a page of a follows lookup endpoint.
 
-                try:
-                    users = Get2UsersIdFollowersResponse.model_validate(response_json)
-                except Exception as e:
-                    logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
-                    logger.warning(response_json)
+    Args:
+        body (bytes): The body of the page.
+        response_model (Type[Union[Get2UsersIdFollowersResponse, Get2UsersIdFollowingResponse]]): The response schema of the endpoint.
+
+    Raises:
+        ValidationError: The response does not match the schema of the endpoint.
+        Exception: User not found error.
 
-                if not users.data:
-                    raise Exception(users)
+    Returns:
+        List[User]: The users of the page.
+    """
+    try:
+        users = response_model.model_validate_json(body)
+    except ValidationError as e:
+        logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
+        logger.warning(body)
+        raise
 
-                for user in users.data:
-                    yield user
+    if not users.data:
+        raise Exception(users)
 
-                if "next_token" in response_json.get("meta"):
-                    params["pagination_token"] = response_json.get("meta").get("next_token")
-                else:
-                    break
+    return users.data
@@ -27,121 +27,164 @@ Examples:
 
         async for user in get_users_by_ids(['1422600096324231168', '3088296873']):
             print(user.model_dump_json())
+
+    Any number of usernames or IDs can be passed. They are requested in batches of 100, several batches at a time::
+
+        async for user in get_users_by_ids(user_ids, max_concurrency=5):
+            print(user.id)
 """
 
+import asyncio
 import logging
-import os
-from typing import AsyncGenerator, Dict, List
+from typing import AsyncGenerator, Dict, List, Union
 
-import aiohttp
+from pydantic import TypeAdapter, ValidationError
 
+from sparta.twitterapi.http import encode_url, get_session, get_with_retry
 from sparta.twitterapi.models.twitter_v2_spec import Get2UsersByResponse, Get2UsersResponse, User
-from sparta.twitterapi.rate_limiter import RateLimiter
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter, SlidingWindowLimiter
 from sparta.twitterapi.tweets.constants import USER_FIELDS
+from sparta.twitterapi.utils import merge
 
 logger = logging.getLogger(__name__)
 
-# To set your enviornment variables in your terminal run the following line:
-# export 'BEARER_TOKEN'='<your_bearer_token>'
-bearer_token = os.environ["BEARER_TOKEN"]
-headers = {"Authorization": f"Bearer {bearer_token}", "content-type": "application/json"}
+USER_LOOKUP_BATCH_SIZE = 100  # Maximum number of usernames or IDs per request of the users lookup endpoints
+
+_USERS_BY_ADAPTER = TypeAdapter(Get2UsersByResponse)
+_USERS_ADAPTER = TypeAdapter(Get2UsersResponse)
 
+# Shared by all calls, so concurrent lookups respect the rate limit learned by the others
+_by_username_rate_limiter = RateLimiter()
+_by_username_backpressure = BackpressureController()
+_by_username_window = SlidingWindowLimiter.for_endpoint("/2/users/by")
+_by_ids_rate_limiter = RateLimiter()
+_by_ids_backpressure = BackpressureController()
+_by_ids_window = SlidingWindowLimiter.for_endpoint("/2/users")
 
-async def get_users_by_username(usernames: List[str]) -> AsyncGenerator[User, None]:
+
+async def get_users_by_username(usernames: List[str], max_concurrency: int = 5) -> AsyncGenerator[User, None]:
     """Asynchronously retrieves information about users specified by their usernames.
 
     This function queries the Twitter API to get information about users based on a list of Twitter usernames. It handles rate limiting using an internal
     instance of RateLimiter, automatically pausing requests if the rate limit is exceeded.
 
     Args:
-        usernames (List[str]): A list of Twitter usernames (handles). Up to 100 usernames are allowed in a single request.
+        usernames (List[str]): A list of Twitter usernames (handles). Repeated usernames are looked up once, in batches of up to
+            USER_LOOKUP_BATCH_SIZE usernames.
+        max_concurrency (int, optional): Maximum number of batches requested at the same time. Defaults to 5.
 
     Yields:
-        User: An object representing a Twitter user for each provided username.
+        User: An object representing a Twitter user for each provided username. Users of different batches are yielded in the order the batches arrive.
 
     Raises:
-        Exception: If an HTTP error occurs that prevents retrieving the user information or if any of the usernames are invalid.
-
-    Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+        Exception: If max_concurrency is less than 1, a request is rejected with a status in FATAL_STATUSES, e.g. HTTP 401, MAX_FAILURES consecutive
+            attempts of a batch failed or none of the users of a batch were found. The remaining requests are cancelled.
     """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "usernames": ",".join(usernames),
-            "user.fields": USER_FIELDS,
-        }
-        logger.debug(f"Search users params={params}")
-        while True:
-            async with session.get("https://api.twitter.com/2/users/by", params=params) as response:
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    raise Exception(f"Cannot search users {params} (HTTP {response.status}): {await response.text()}")
-
-                response_json = await response.json()
-                try:
-                    users = Get2UsersByResponse.model_validate(response_json)
-                except Exception as e:
-                    logger.warn(f"Inconsistent twitter OpenAPI documentation {e}")
-                    logger.warn(response_json)
-                if not users.data:
-                    raise Exception(users)
-                for user in users.data:
-                    yield user
-
-            break
-
-
-async def get_users_by_ids(ids: List[str]) -> AsyncGenerator[User, None]:
+    if max_concurrency < 1:
+        raise Exception(f"max_concurrency must be at least 1, got {max_concurrency}")
+    # Repeated usernames would only spend rate limit
+    usernames = list(dict.fromkeys(usernames))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    batches: List[List[str]] = []
+    for start in range(0, len(usernames), USER_LOOKUP_BATCH_SIZE):
+        end = start + USER_LOOKUP_BATCH_SIZE
+        batches.append(usernames[start:end])
+    lookups = (
+        _lookup_users(
+            "https://api.twitter.com/2/users/by",
+            {"usernames": ",".join(batch)},
+            _USERS_BY_ADAPTER,
+            _by_username_rate_limiter,
+            _by_username_backpressure,
+            _by_username_window,
+            semaphore,
+        )
+        for batch in batches
+    )
+    async for user in merge(*lookups):
+        yield user
+
+
+async def get_users_by_ids(ids: List[str], max_concurrency: int = 5) -> AsyncGenerator[User, None]:
     """Asynchronously retrieves information about users specified by their usernames.
 
     This function queries the Twitter API to get information about users based on a list of Twitter user ids. It handles rate limiting using an internal
     instance of RateLimiter, automatically pausing requests if the rate limit is exceeded.
 
     Args:
-        usernames (List[str]): A list of Twitter user ids. Up to 100 usernames are allowed in a single request.
+        ids (List[str]): A list of Twitter user ids. Repeated ids are looked up once, in batches of up to USER_LOOKUP_BATCH_SIZE ids.
+        max_concurrency (int, optional): Maximum number of batches requested at the same time. Defaults to 5.
 
     Yields:
-        User: An object representing a Twitter user for each provided username.
+        User: An object representing a Twitter user for each provided username. Users of different batches are yielded in the order the batches arrive.
+
+    Raises:
+        Exception: If max_concurrency is less than 1, a request is rejected with a status in FATAL_STATUSES, e.g. HTTP 401, MAX_FAILURES consecutive
+            attempts of a batch failed or none of the users of a batch were found. The remaining requests are cancelled.
+    """
+    if max_concurrency < 1:
+        raise Exception(f"max_concurrency must be at least 1, got {max_concurrency}")
+    # Repeated ids would only spend rate limit
+    ids = list(dict.fromkeys(ids))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    batches: List[List[str]] = []
+    for start in range(0, len(ids), USER_LOOKUP_BATCH_SIZE):
+        end = start + USER_LOOKUP_BATCH_SIZE
+        batches.append(ids[start:end])
+    lookups = (
+        _lookup_users(
+            "https://api.twitter.com/2/users",
+            {"ids": ",".join(batch)},
+            _USERS_ADAPTER,
+            _by_ids_rate_limiter,
+            _by_ids_backpressure,
+            _by_ids_window,
+            semaphore,
+        )
+        for batch in batches
+    )
+    async for user in merge(*lookups):
+        yield user
+
+
+async def _lookup_users(
+    url: str,
+    params: Dict[str, str],
+    adapter: Union[TypeAdapter[Get2UsersByResponse], TypeAdapter[Get2UsersResponse]],
+    rate_limiter: RateLimiter,
+    backpressure: BackpressureController,
+    window: SlidingWindowLimiter,
+    semaphore: asyncio.Semaphore,
+) -> AsyncGenerator[User, None]:
+    """Requests one batch of a users lookup endpoint, holding the semaphore meanwhile. See _parse_users for the adapter."""
+    request_url = encode_url(url, {**params, "user.fields": USER_FIELDS})
+    logger.debug("Search users url=%s", request_url)
+    async with semaphore:
+        body = await get_with_retry(get_session(), request_url, rate_limiter, backpressure, "Cannot search users", window)
+    for user in _parse_users(body, adapter):
+        yield user
+
+
+def _parse_users(body: bytes, adapter: Union[TypeAdapter[Get2UsersByResponse], TypeAdapter[Get2UsersResponse]]) -> List[User]:
+    """Validates the response of a user lookup.
+
+    Args:
+        body (bytes): The response body.
+        adapter (Union[TypeAdapter[Get2UsersByResponse], TypeAdapter[Get2UsersResponse]]): The validator for the response schema of the endpoint.
 
     Raises:
-        Exception: If an HTTP error occurs that prevents retrieving the user information or if any of the usernames are invalid.
+        ValidationError: The response does not match the schema of the endpoint.
+        Exception: None of the users were found.
 
-    Note:
-        The function automatically handles pagination of results using the 'next_token' provided by Twitter's API response.
+    Returns:
+        List[User]: The users of the response.
     """
-    rate_limiter = RateLimiter()
-    async with aiohttp.ClientSession(headers=headers) as session:
-        params: Dict[str, str] = {
-            "ids": ",".join(ids),
-            "user.fields": USER_FIELDS,
-        }
-        logger.debug(f"Search users params={params}")
-        while True:
-            async with session.get("https://api.twitter.com/2/users", params=params) as response:
-                rate_limiter.update_limits(dict(response.headers))
-
-                if response.status == 429:
-                    await rate_limiter.wait_for_limit_reset()
-                    continue
-
-                if not response.ok:
-                    raise Exception(f"Cannot search users {params} (HTTP {response.status}): {await response.text()}")
-
-                response_json = await response.json()
-                try:
-                    users = Get2UsersResponse.model_validate(response_json)
-                except Exception as e:
-                    logger.warn(f"Inconsistent twitter OpenAPI documentation {e}")
-                    logger.warn(response_json)
-                if not users.data:
-                    raise Exception(users)
-                for user in users.data:
-                    yield user
-
-            break
+    try:
+        users = adapter.validate_json(body)
+    except ValidationError as e:
+        logger.warning(f"Inconsistent twitter OpenAPI documentation {e}")
+        logger.warning(body)
+        raise
+    if not users.data:
+        raise Exception(users)
+    return users.data
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""utils.py: Helpers shared by the Twitter API endpoint implementations."""
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, TypeVar, Union
+
+from pydantic_core import from_json
+
+from sparta.twitterapi.models.tweet_response import TweetResponse
+
+T = TypeVar("T")
+
+_DONE = object()  # Marks the end of a prefetched generator
+# Include lists whose objects recur across pages, with the key identifying an object
+_INTERNED_INCLUDES: Tuple[Tuple[str, str], ...] = (("users", "id"), ("media", "media_key"), ("places", "id"))
+INTERN_LIMIT = 10000  # Include objects kept for sharing across pages, the least recently seen are dropped beyond it
+
+
+def format_datetime(dt: Union[str, datetime]) -> str:
+    """Formats a timestamp the way the Twitter API expects it (YYYY-MM-DDTHH:mm:ssZ).
+
+    Formats the integer fields directly instead of going through the locale aware ``strftime``. Strings are returned unchanged, so callers that already
+    have formatted timestamps do not need to parse them into datetimes first. Naive datetimes are taken as UTC, timezone-aware ones are converted to UTC.
+
+    Args:
+        dt (Union[str, datetime]): The timestamp to format, or an already formatted timestamp.
+
+    Returns:
+        str: The formatted timestamp, e.g. 2021-06-01T00:00:00Z.
+    """
+    if isinstance(dt, str):
+        return dt
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}Z"
+
+
+def parse_tweet_page(body: bytes, interned: Optional[OrderedDict[Tuple[str, str], Dict[str, Any]]] = None) -> Tuple[List[TweetResponse], Optional[str]]:
+    """Parses a page of a paginated tweet endpoint, e.g. for get_pages.
+
+    The tweets of the page share its includes, and missing or null data and includes are treated as empty.
+
+    Args:
+        body (bytes): The response body.
+        interned (Optional[OrderedDict[Tuple[str, str], Dict[str, Any]]], optional): Users, media and places seen on recent pages, keyed by their
+            include list and ID. If given, objects already seen are replaced with the earlier dict, so authors that appear on many pages are kept in
+            memory once, and new ones are added. Only the INTERN_LIMIT most recently seen objects are kept, so long retrievals do not retain every
+            object they ever saw. Defaults to None.
+
+    Returns:
+        Tuple[List[TweetResponse], Optional[str]]: The tweets of the page and the token of the next page, if any.
+    """
+    response_json = from_json(body)
+    includes = response_json.get("includes") or {}
+    if interned is not None:
+        for name, id_key in _INTERNED_INCLUDES:
+            objects = includes.get(name)
+            if objects:
+                includes[name] = [_intern(interned, (name, obj[id_key]), obj) if id_key in obj else obj for obj in objects]
+    page = [TweetResponse.model_construct(tweet=tweet, includes=includes) for tweet in response_json.get("data") or ()]
+    return page, (response_json.get("meta") or {}).get("next_token")
+
+
+def _intern(interned: OrderedDict[Tuple[str, str], Dict[str, Any]], key: Tuple[str, str], obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the earlier dict of an include object if it was seen recently, otherwise remembers obj, dropping the least recently seen beyond
+    INTERN_LIMIT."""
+    earlier = interned.get(key)
+    if earlier is not None:
+        interned.move_to_end(key)
+        return earlier
+    interned[key] = obj
+    if len(interned) > INTERN_LIMIT:
+        interned.popitem(last=False)
+    return obj
+
+
+async def prefetch(generator: AsyncGenerator[T, None], size: int = 1) -> AsyncGenerator[T, None]:
+    """Runs an async generator ahead of its consumer in a background task.
+
+    Paginated endpoints can only request the next page after the previous one arrived. Prefetching requests the next page while the consumer still
+    processes the current one, which hides the request latency behind the consumer's work. The items keep their order.
+
+    Args:
+        generator (AsyncGenerator[T, None]): The generator to run ahead, e.g. a generator of response pages.
+        size (int, optional): Number of items buffered in addition to the one being fetched. Defaults to 1.
+
+    Raises:
+        Exception: Re-raises the error of the generator once the items produced before the error were consumed.
+
+    Yields:
+        T: The items of the generator in their original order.
+    """
+    queue: asyncio.Queue[Tuple[Any, Optional[Exception]]] = asyncio.Queue(maxsize=size)
+
+    async def produce() -> None:
+        try:
+            async for item in generator:
+                await queue.put((item, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+        else:
+            await queue.put((_DONE, None))
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await generator.aclose()
+
+
+async def merge(*generators: AsyncGenerator[T, None], queue_size: int = 1024) -> AsyncGenerator[T, None]:
+    """Consumes several async generators concurrently and yields their items in arrival order.
+
+    Args:
+        *generators (AsyncGenerator[T, None]): The generators to consume.
+        queue_size (int, optional): Maximum number of buffered items. The generators pause while the buffer is full. Defaults to 1024.
+
+    Raises:
+        Exception: Re-raises the first error of any generator and stops the others.
+
+    Yields:
+        T: The next item of any generator.
+    """
+    queue: asyncio.Queue[Tuple[Any, Optional[Exception]]] = asyncio.Queue(maxsize=queue_size)
+
+    async def consume(generator: AsyncGenerator[T, None]) -> None:
+        try:
+            async for item in generator:
+                await queue.put((item, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+        else:
+            await queue.put((_DONE, None))
+
+    tasks = [asyncio.create_task(consume(generator)) for generator in generators]
+    try:
+        running = len(tasks)
+        while running:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                running -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for generator in generators:
+            await generator.aclose()
@@ -1,6 +1,6 @@
 import pytest
 
-from sparta.twitterapi.compliance.compliance_stream import get_tweet_compliance_stream, get_user_compliance_stream
+from sparta.twitterapi.compliance.compliance_stream import get_all_tweet_compliance_events, get_tweet_compliance_stream, get_user_compliance_stream
 
 
 @pytest.mark.asyncio
@@ -15,3 +15,10 @@ async def test_get_user_compliance_stream() -> None:
     async for complianceEvent in get_user_compliance_stream(partition=1):
         assert complianceEvent
         break
+
+
+@pytest.mark.asyncio
+async def test_get_all_tweet_compliance_events() -> None:
+    async for complianceEvent in get_all_tweet_compliance_events():
+        assert complianceEvent
+        break
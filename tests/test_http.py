@@ -0,0 +1,103 @@
+import asyncio
+from types import TracebackType
+from typing import AsyncGenerator, Dict, List, Optional, Type, cast
+
+import aiohttp
+import pytest
+from yarl import URL
+
+from sparta.twitterapi.http import MAX_FAILURES, get_with_retry, iter_line_batches, iter_lines
+from sparta.twitterapi.rate_limiter import BackpressureController, RateLimiter
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+        self.status = status
+        self.ok = status < 400
+        self.headers = headers or {}
+
+    async def text(self) -> str:
+        return ""
+
+    async def read(self) -> bytes:
+        return b""
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException], tb: Optional[TracebackType]) -> None:
+        pass
+
+
+class FakeSession:
+    def __init__(self, status: int) -> None:
+        self.status = status
+        self.requests = 0
+
+    def get(self, url: URL) -> FakeResponse:
+        self.requests += 1
+        return FakeResponse(self.status)
+
+
+@pytest.mark.asyncio
+async def test_get_with_retry_gives_up_on_persistent_429(monkeypatch: pytest.MonkeyPatch) -> None:
+    delays: List[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    session = FakeSession(429)
+
+    # A 429 without rate limit headers never tells when to retry, so the attempts must count towards MAX_FAILURES
+    with pytest.raises(Exception, match="giving up"):
+        await get_with_retry(cast(aiohttp.ClientSession, session), URL("https://api.twitter.com/2/tweets"), RateLimiter(), BackpressureController(), "Test")
+    assert session.requests == MAX_FAILURES
+    assert len(delays) == MAX_FAILURES - 1
+
+
+class FakeStreamReader:
+    def __init__(self, *chunks: bytes) -> None:
+        self.chunks = chunks
+
+    async def iter_chunked(self, n: int) -> AsyncGenerator[bytes, None]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+async def read_lines(*chunks: bytes, max_line_size: int = 1 << 10) -> List[bytes]:
+    content = cast(aiohttp.StreamReader, FakeStreamReader(*chunks))
+    return [line async for line in iter_lines(content, max_line_size=max_line_size)]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_joins_lines_split_across_chunks() -> None:
+    assert await read_lines(b'{"a":', b"1}\n{", b'"b":2}\n') == [b'{"a":1}', b'{"b":2}']
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_keeps_keep_alive_lines() -> None:
+    assert await read_lines(b"a\n\n", b"\nb\n") == [b"a", b"", b"", b"b"]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_strips_crlf() -> None:
+    # The carriage return and the newline of the second line arrive in different chunks
+    assert await read_lines(b"a\r\nb\r", b"\nc\r\n") == [b"a", b"b", b"c"]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_yields_trailing_line_without_newline() -> None:
+    assert await read_lines(b"a\nb", b"c") == [b"a", b"bc"]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_rejects_line_over_limit() -> None:
+    with pytest.raises(Exception, match="exceeds 8 bytes"):
+        await read_lines(b"a\n12345", b"6789", max_line_size=8)
+
+
+@pytest.mark.asyncio
+async def test_iter_line_batches_yields_lines_completed_by_each_chunk() -> None:
+    content = cast(aiohttp.StreamReader, FakeStreamReader(b"a\nb", b"c\nd\n", b"e", b"f\n"))
+    assert [lines async for lines in iter_line_batches(content)] == [[b"a"], [b"bc", b"d"], [b"ef"]]
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, AsyncGenerator, Iterator, List, Optional, cast
+
+import aiohttp
+import pytest
+
+from sparta.twitterapi.models.tweet_response import TweetResponse
+from sparta.twitterapi.tweets import quote_tweets
+from sparta.twitterapi.tweets.quote_tweets import clear_quote_tweet_cache, get_quote_tweets
+
+
+class FakePages:
+    def __init__(self) -> None:
+        self.requested: List[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, id: str, *args: Any) -> AsyncGenerator[List[TweetResponse], None]:
+        self.requested.append(id)
+        await self.release.wait()
+        yield [TweetResponse.model_construct(tweet={"id": f"quote of {id}"}, includes={})]
+
+
+@pytest.fixture
+def fake_pages(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakePages]:
+    pages = FakePages()
+    monkeypatch.setattr(quote_tweets, "_iter_quote_tweet_pages", pages)
+    clear_quote_tweet_cache()
+    yield pages
+    clear_quote_tweet_cache()
+
+
+async def collect(id: str, session: Optional[aiohttp.ClientSession] = None) -> List[TweetResponse]:
+    return [tweet_response async for tweet_response in get_quote_tweets(id, session=session, cache=True)]
+
+
+@pytest.mark.asyncio
+async def test_quote_tweet_cache_evicts_least_recently_used(fake_pages: FakePages, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(quote_tweets, "QUOTE_TWEET_CACHE_SIZE", 2)
+
+    await collect("1")
+    await collect("2")
+    await collect("1")  # Served from the cache, so 2 becomes the least recently used entry
+    await collect("3")
+    assert fake_pages.requested == ["1", "2", "3"]
+
+    await collect("1")
+    await collect("2")
+    assert fake_pages.requested == ["1", "2", "3", "2"]
+
+
+@pytest.mark.asyncio
+async def test_quote_tweet_cache_separates_sessions(fake_pages: FakePages) -> None:
+    session = cast(aiohttp.ClientSession, object())
+
+    await collect("1")
+    await collect("1", session)
+    await collect("1", session)
+    assert fake_pages.requested == ["1", "1"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_retrieval(fake_pages: FakePages) -> None:
+    fake_pages.release.clear()
+    first = asyncio.create_task(collect("1"))
+    second = asyncio.create_task(collect("1"))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    fake_pages.release.set()
+
+    tweet_responses = await second
+    assert [tweet_response.tweet["id"] for tweet_response in tweet_responses] == ["quote of 1"]
+    assert first.cancelled()
+    assert fake_pages.requested == ["1"]
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from typing import List
+
+import pytest
+
+from sparta.twitterapi import rate_limiter as rate_limiter_module
+from sparta.twitterapi.rate_limiter import ENDPOINT_RATE_LIMITS, BackpressureController, RateLimiter, SlidingWindowLimiter
+
+
+@pytest.mark.asyncio
+async def test_acquire_without_rate_limit_headers(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def fail_sleep(delay: float) -> None:
+        raise AssertionError(f"acquire() waited {delay} seconds")
+
+    monkeypatch.setattr(asyncio, "sleep", fail_sleep)
+    rate_limiter = RateLimiter()
+
+    # Responses without rate limit headers leave the window unknown, so requests are not held back
+    for _ in range(3):
+        await rate_limiter.acquire()
+        rate_limiter.update_limits({})
+    assert rate_limiter.remaining is None
+    assert rate_limiter.reset_time is None
+
+
+@pytest.mark.asyncio
+async def test_acquire_reserves_remaining_requests() -> None:
+    rate_limiter = RateLimiter()
+    rate_limiter.update_limits({"x-rate-limit-remaining": "1", "x-rate-limit-reset": str(int(time.time()) + 900)})
+
+    await rate_limiter.acquire()
+    assert rate_limiter.remaining == 0
+    assert rate_limiter.should_wait()
+
+
+def test_backpressure_limit_grows_on_success() -> None:
+    backpressure = BackpressureController(initial_limit=4, max_limit=5)
+
+    backpressure.on_success()
+    assert backpressure.limit == 4.125
+    for _ in range(100):
+        backpressure.on_success()
+    assert backpressure.limit == 5
+
+
+def test_backpressure_limit_grows_only_within_target_latency() -> None:
+    backpressure = BackpressureController(initial_limit=4, target_latency=1.0)
+
+    backpressure.on_success(latency=2.0)
+    assert backpressure.limit == 4
+    backpressure.on_success(latency=0.5)
+    assert backpressure.limit == 4.125
+
+
+def test_backpressure_limit_shrinks_on_failure() -> None:
+    backpressure = BackpressureController(initial_limit=8, min_limit=2)
+
+    backpressure.on_failure()
+    assert backpressure.limit == 4
+    backpressure.on_failure()
+    backpressure.on_failure()
+    assert backpressure.limit == 2
+
+
+async def hold_slot(backpressure: BackpressureController, name: str, admitted: List[str]) -> None:
+    await backpressure.acquire()
+    admitted.append(name)
+
+
+@pytest.mark.asyncio
+async def test_backpressure_wakes_waiters_in_order() -> None:
+    backpressure = BackpressureController(initial_limit=1)
+    admitted: List[str] = []
+    await backpressure.acquire()
+    waiters = [asyncio.create_task(hold_slot(backpressure, name, admitted)) for name in ("a", "b", "c")]
+    await asyncio.sleep(0)
+    assert admitted == []
+
+    for expected in (["a"], ["a", "b"], ["a", "b", "c"]):
+        backpressure.release()
+        await asyncio.sleep(0)
+        assert admitted == expected
+        assert backpressure.in_flight == 1
+    await asyncio.gather(*waiters)
+
+
+@pytest.mark.asyncio
+async def test_backpressure_cancelled_waiter_does_not_leak_slot() -> None:
+    backpressure = BackpressureController(initial_limit=1)
+    admitted: List[str] = []
+    await backpressure.acquire()
+    cancelled = asyncio.create_task(hold_slot(backpressure, "cancelled", admitted))
+    waiting = asyncio.create_task(hold_slot(backpressure, "waiting", admitted))
+    await asyncio.sleep(0)
+
+    # The slot is handed to the first waiter, which is cancelled before it can take it
+    backpressure.release()
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert cancelled.cancelled()
+    assert admitted == ["waiting"]
+    assert backpressure.in_flight == 1
+    assert not backpressure._waiters
+    await waiting
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    clock = FakeClock()
+    # Only the clock of the limiter is replaced, the event loop keeps using the real one
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_waits_for_oldest_request(clock: FakeClock) -> None:
+    window = SlidingWindowLimiter(2, window=10)
+
+    await window.wait_if_throttled()
+    clock.now += 4
+    await window.wait_if_throttled()
+    clock.now += 2
+    assert clock.sleeps == []
+
+    # The window is full until the first request leaves it at 10 seconds
+    await window.wait_if_throttled()
+    assert clock.sleeps == [4]
+    assert clock.now == 1010
+
+    # The second request leaves the window at 14 seconds
+    await window.wait_if_throttled()
+    assert clock.sleeps == [4, 4]
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_admits_requests_after_window(clock: FakeClock) -> None:
+    window = SlidingWindowLimiter(2, window=10)
+
+    for _ in range(2):
+        await window.wait_if_throttled()
+    clock.now += 10
+    for _ in range(2):
+        await window.wait_if_throttled()
+    assert clock.sleeps == []
+
+
+def test_sliding_window_for_endpoint() -> None:
+    for path, (limit, window_length) in ENDPOINT_RATE_LIMITS.items():
+        window = SlidingWindowLimiter.for_endpoint(path)
+        assert window.limit == limit
+        assert window.window == window_length
+
+    with pytest.raises(KeyError):
+        SlidingWindowLimiter.for_endpoint("/2/unknown")
@@ -1,13 +1,18 @@
 from datetime import datetime, timedelta, timezone
+from typing import AsyncGenerator, Callable
 
 import pytest
 
-from sparta.twitterapi.tweets.full_search import get_full_search, get_full_search_count
-from sparta.twitterapi.tweets.quote_tweets import get_quote_tweets
+from sparta.twitterapi.models.tweet_response import TweetResponse
+from sparta.twitterapi.tweets.full_search import get_full_search, get_full_search_count, get_full_search_pages
+from sparta.twitterapi.tweets.quote_tweets import get_quote_tweets, get_quote_tweets_many
 from sparta.twitterapi.tweets.recent_search import get_recent_search, get_recent_search_count
 from sparta.twitterapi.tweets.retweets import get_retweets
 from sparta.twitterapi.tweets.tweets import get_tweets_by_id
 
+# The recent search only covers the last seven days and cannot end in the future
+RECENT_END_TIME = datetime.now(timezone.utc) - timedelta(seconds=30)
+
 
 @pytest.mark.asyncio
 async def test_get_tweets_by_id() -> None:
@@ -20,6 +25,18 @@ async def test_get_tweets_by_id() -> None:
         assert tweet_response.tweet["id"] in tweet_ids
 
 
+@pytest.mark.asyncio
+async def test_get_tweets_by_id_duplicates() -> None:
+    # Repeated IDs are looked up once
+    tweet_ids = ["1511275800758300675", "1546866845180887040"] * 51
+
+    seen_ids = set()
+    async for tweet_response in get_tweets_by_id(tweet_ids, max_concurrency=2):
+        assert tweet_response.tweet["id"] in tweet_ids
+        seen_ids.add(tweet_response.tweet["id"])
+    assert seen_ids == set(tweet_ids)
+
+
 @pytest.mark.asyncio
 async def test_get_retweets_by_id() -> None:
     async for user in get_retweets("1710948847826919639"):
@@ -28,12 +45,16 @@ async def test_get_retweets_by_id() -> None:
 
 
 @pytest.mark.asyncio
-async def test_get_full_search() -> None:
-    query = "@projekt_sparta -is:retweet"
-    starttime = datetime(2021, 6, 1, 0, 0)
-    endtime = datetime(2021, 10, 4, 0, 0)
-
-    async for tweet_response in get_full_search(query=query, start_time=starttime, end_time=endtime):
+@pytest.mark.parametrize(
+    "search, query, starttime, endtime",
+    [
+        (get_full_search, "@projekt_sparta -is:retweet", datetime(2021, 6, 1, 0, 0), datetime(2021, 10, 4, 0, 0)),
+        (get_recent_search, "#test -is:retweet", RECENT_END_TIME - timedelta(minutes=120), RECENT_END_TIME),
+    ],
+    ids=["full", "recent"],
+)
+async def test_get_search(search: Callable[..., AsyncGenerator[TweetResponse, None]], query: str, starttime: datetime, endtime: datetime) -> None:
+    async for tweet_response in search(query=query, start_time=starttime, end_time=endtime):
         assert tweet_response.tweet is not None
         assert tweet_response.includes is not None
         assert "id" in tweet_response.tweet
@@ -41,32 +62,31 @@ async def test_get_full_search() -> None:
 
 
 @pytest.mark.asyncio
-async def test_get_full_search_count() -> None:
+async def test_get_full_search_pages() -> None:
     query = "@projekt_sparta -is:retweet"
     starttime = datetime(2021, 6, 1, 0, 0)
     endtime = datetime(2021, 10, 4, 0, 0)
 
-    count = sum([count.tweet_count async for count in get_full_search_count(query=query, start_time=starttime, end_time=endtime, granularity="day")])
-    assert count > 0
+    async for page in get_full_search_pages(query=query, start_time=starttime, end_time=endtime):
+        assert len(page) > 0
+        assert "id" in page[0].tweet
+        break
 
 
 @pytest.mark.asyncio
-async def test_get_recent_search() -> None:
-    query = "#test -is:retweet"
-    endtime = datetime.now(timezone.utc) - timedelta(seconds=30)
-    starttime = endtime - timedelta(minutes=120)
+async def test_get_full_search_count() -> None:
+    query = "@projekt_sparta -is:retweet"
+    starttime = datetime(2021, 6, 1, 0, 0)
+    endtime = datetime(2021, 10, 4, 0, 0)
 
-    async for tweet_response in get_recent_search(query=query, start_time=starttime, end_time=endtime):
-        assert tweet_response.tweet is not None
-        assert tweet_response.includes is not None
-        assert "id" in tweet_response.tweet
-        break
+    count = sum([count.tweet_count async for count in get_full_search_count(query=query, start_time=starttime, end_time=endtime, granularity="day")])
+    assert count > 0
 
 
 @pytest.mark.asyncio
 async def test_get_recent_search_count() -> None:
     query = "#test -is:retweet"
-    endtime = datetime.now(timezone.utc) - timedelta(seconds=30)
+    endtime = RECENT_END_TIME
     starttime = endtime - timedelta(minutes=120)
 
     count = sum([count.tweet_count async for count in get_recent_search_count(query=query, start_time=starttime, end_time=endtime, granularity="day")])
@@ -83,3 +103,13 @@ async def test_get_quote_tweets() -> None:
             assert tweet_response.includes is not None
             assert "id" in tweet_response.tweet
             break
+
+
+@pytest.mark.asyncio
+async def test_get_quote_tweets_many() -> None:
+    tweet_ids = ["1511275800758300675", "1594704992480690178"]
+
+    async for tweet_id, tweet_response in get_quote_tweets_many(tweet_ids):
+        assert tweet_id in tweet_ids
+        assert "id" in tweet_response.tweet
+        break
@@ -1,6 +1,6 @@
 import pytest
 
-from sparta.twitterapi.users.follower import get_followers_by_id, get_following_by_id
+from sparta.twitterapi.users.follower import get_followers_by_id, get_followers_many, get_following_by_id
 from sparta.twitterapi.users.user import get_users_by_ids, get_users_by_username
 
 
@@ -18,6 +18,18 @@ async def test_get_users_by_ids() -> None:
         assert user.id is not None
 
 
+@pytest.mark.asyncio
+async def test_get_users_by_ids_duplicates() -> None:
+    # Repeated IDs are looked up once
+    user_ids = ["1422600096324231168", "3088296873"] * 51
+
+    seen_ids = set()
+    async for user in get_users_by_ids(user_ids, max_concurrency=2):
+        assert user.id in user_ids
+        seen_ids.add(user.id)
+    assert seen_ids == set(user_ids)
+
+
 @pytest.mark.asyncio
 async def test_get_followers_by_id() -> None:
     async for user in get_followers_by_id("1422600096324231168"):
@@ -30,3 +42,13 @@ async def test_get_following_by_id() -> None:
     async for user in get_following_by_id("1422600096324231168"):
         assert user is not None
         assert user.id is not None
+
+
+@pytest.mark.asyncio
+async def test_get_followers_many() -> None:
+    user_ids = ["1422600096324231168", "3088296873"]
+
+    async for id, user in get_followers_many(user_ids, max_concurrency=2):
+        assert id in user_ids
+        assert user is not None
+        assert user.id is not None